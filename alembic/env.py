@@ -4,6 +4,7 @@ from sqlalchemy import pool
 from alembic import context
 
 # Import your models
+from app.config import settings
 from app.database import Base
 from app.models import User
 
@@ -16,6 +17,10 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Fall back to the app's database URL when no alembic.ini provides one
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", settings.database_url.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 target_metadata = Base.metadata
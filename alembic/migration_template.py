@@ -15,6 +15,8 @@ from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
 
+from app.alembic_utils import create_index_concurrently, drop_index_concurrently
+
 # revision identifiers, used by Alembic.
 revision = 'xxxxxxxxxxxx'  # Will be auto-generated
 down_revision = 'yyyyyyyyyyyy'  # Previous revision
@@ -39,8 +41,8 @@ def upgrade():
         sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
         sa.PrimaryKeyConstraint('id')
     )
-    op.create_index(op.f('ix_vendor_integrations_id'), 'vendor_integrations', ['id'], unique=False)
-    op.create_index(op.f('ix_vendor_integrations_user_id'), 'vendor_integrations', ['user_id'], unique=False)
+    create_index_concurrently('ix_vendor_integrations_id', 'vendor_integrations', ['id'])
+    create_index_concurrently('ix_vendor_integrations_user_id', 'vendor_integrations', ['user_id'])
     
     # Create oauth_tokens table
     op.create_table(
@@ -58,18 +60,18 @@ def upgrade():
         sa.ForeignKeyConstraint(['vendor_integration_id'], ['vendor_integrations.id'], ),
         sa.PrimaryKeyConstraint('id')
     )
-    op.create_index(op.f('ix_oauth_tokens_id'), 'oauth_tokens', ['id'], unique=False)
-    op.create_index(op.f('ix_oauth_tokens_vendor_integration_id'), 'oauth_tokens', ['vendor_integration_id'], unique=False)
+    create_index_concurrently('ix_oauth_tokens_id', 'oauth_tokens', ['id'])
+    create_index_concurrently('ix_oauth_tokens_vendor_integration_id', 'oauth_tokens', ['vendor_integration_id'])
 
 
 def downgrade():
     """
     Drop vendor integration tables
     """
-    op.drop_index(op.f('ix_oauth_tokens_vendor_integration_id'), table_name='oauth_tokens')
-    op.drop_index(op.f('ix_oauth_tokens_id'), table_name='oauth_tokens')
+    drop_index_concurrently('ix_oauth_tokens_vendor_integration_id', 'oauth_tokens')
+    drop_index_concurrently('ix_oauth_tokens_id', 'oauth_tokens')
     op.drop_table('oauth_tokens')
     
-    op.drop_index(op.f('ix_vendor_integrations_user_id'), table_name='vendor_integrations')
-    op.drop_index(op.f('ix_vendor_integrations_id'), table_name='vendor_integrations')
+    drop_index_concurrently('ix_vendor_integrations_user_id', 'vendor_integrations')
+    drop_index_concurrently('ix_vendor_integrations_id', 'vendor_integrations')
     op.drop_table('vendor_integrations')
@@ -0,0 +1,33 @@
+"""Add partial index on sync_jobs for queue polling
+
+Revision ID: add_sync_jobs_queue_index
+Revises: add_sync_metadata_and_jobs
+Create Date: 2026-10-15
+
+"""
+
+import sqlalchemy as sa
+
+from app.alembic_utils import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = "add_sync_jobs_queue_index"
+down_revision = "add_sync_metadata_and_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Only the small active set of jobs is indexed, so the worker's
+    # "oldest queued job" poll stays an index scan as finished history grows.
+    create_index_concurrently(
+        "ix_sync_jobs_queue",
+        "sync_jobs",
+        ["created_at", "id"],
+        where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently("ix_sync_jobs_queue", "sync_jobs")
@@ -9,6 +9,8 @@ Create Date: 2026-01-13
 from alembic import op
 import sqlalchemy as sa
 
+from app.alembic_utils import create_index_concurrently, drop_index_concurrently
+
 
 # revision identifiers, used by Alembic.
 revision = "add_sync_metadata_and_jobs"
@@ -43,15 +45,15 @@ def upgrade() -> None:
         sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
     )
 
-    op.create_index("ix_sync_jobs_user_id", "sync_jobs", ["user_id"], unique=False)
-    op.create_index("ix_sync_jobs_vendor", "sync_jobs", ["vendor"], unique=False)
-    op.create_index("ix_sync_jobs_status", "sync_jobs", ["status"], unique=False)
+    create_index_concurrently("ix_sync_jobs_user_id", "sync_jobs", ["user_id"])
+    create_index_concurrently("ix_sync_jobs_vendor", "sync_jobs", ["vendor"])
+    create_index_concurrently("ix_sync_jobs_status", "sync_jobs", ["status"])
 
 
 def downgrade() -> None:
-    op.drop_index("ix_sync_jobs_status", table_name="sync_jobs")
-    op.drop_index("ix_sync_jobs_vendor", table_name="sync_jobs")
-    op.drop_index("ix_sync_jobs_user_id", table_name="sync_jobs")
+    drop_index_concurrently("ix_sync_jobs_status", "sync_jobs")
+    drop_index_concurrently("ix_sync_jobs_vendor", "sync_jobs")
+    drop_index_concurrently("ix_sync_jobs_user_id", "sync_jobs")
     op.drop_table("sync_jobs")
 
     op.drop_column("vendor_integrations", "sync_job_id")
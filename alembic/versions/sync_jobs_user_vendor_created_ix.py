@@ -0,0 +1,32 @@
+"""Add sync_jobs (user_id, vendor, created_at DESC) index
+
+Revision ID: sync_jobs_user_vendor_created_ix
+Revises: vendor_integ_user_vendor_unique
+Create Date: 2026-10-15
+
+"""
+
+import sqlalchemy as sa
+
+from app.alembic_utils import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = "sync_jobs_user_vendor_created_ix"
+down_revision = "vendor_integ_user_vendor_unique"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The (user_id, vendor, status, created_at) index cannot return the newest
+    # job across all statuses without a sort
+    create_index_concurrently(
+        "ix_sync_jobs_user_vendor_created",
+        "sync_jobs",
+        ["user_id", "vendor", sa.text("created_at DESC")],
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently("ix_sync_jobs_user_vendor_created", "sync_jobs")
@@ -0,0 +1,36 @@
+"""Add composite sync_jobs (user_id, vendor, status) index
+
+Revision ID: sync_jobs_user_vendor_status_ix
+Revises: add_sync_jobs_queue_index
+Create Date: 2026-10-15
+
+"""
+
+import sqlalchemy as sa
+
+from app.alembic_utils import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = "sync_jobs_user_vendor_status_ix"
+down_revision = "add_sync_jobs_queue_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    create_index_concurrently(
+        "ix_sync_jobs_user_vendor_status",
+        "sync_jobs",
+        ["user_id", "vendor", "status", sa.text("created_at DESC")],
+        include=["id", "finished_at", "last_error"],
+    )
+    # Left-most prefixes of the composite index cover these lookups
+    drop_index_concurrently("ix_sync_jobs_user_id", "sync_jobs")
+    drop_index_concurrently("ix_sync_jobs_vendor", "sync_jobs")
+
+
+def downgrade() -> None:
+    create_index_concurrently("ix_sync_jobs_user_id", "sync_jobs", ["user_id"])
+    create_index_concurrently("ix_sync_jobs_vendor", "sync_jobs", ["vendor"])
+    drop_index_concurrently("ix_sync_jobs_user_vendor_status", "sync_jobs")
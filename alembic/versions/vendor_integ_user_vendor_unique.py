@@ -0,0 +1,99 @@
+"""Add unique (user_id, vendor) constraint on vendor_integrations
+
+Revision ID: vendor_integ_user_vendor_unique
+Revises: sync_jobs_user_vendor_status_ix
+Create Date: 2026-10-15
+
+"""
+
+from alembic import op
+
+from app.alembic_utils import create_index_concurrently, drop_index_concurrently, is_postgresql
+
+
+# Every non-kept row of a duplicated (user_id, vendor) pair, with the row it
+# folds into: active rows win, then the most recently updated, then the newest id
+_DUPLICATES = """
+    SELECT id, keep_id FROM (
+        SELECT id, FIRST_VALUE(id) OVER (
+            PARTITION BY user_id, vendor
+            ORDER BY
+                CASE WHEN is_active THEN 0 ELSE 1 END,
+                CASE WHEN COALESCE(updated_at, created_at) IS NULL THEN 1 ELSE 0 END,
+                COALESCE(updated_at, created_at) DESC,
+                id DESC
+        ) AS keep_id
+        FROM vendor_integrations
+    ) ranked
+    WHERE id <> keep_id
+"""
+
+
+# revision identifiers, used by Alembic.
+revision = "vendor_integ_user_vendor_unique"
+down_revision = "sync_jobs_user_vendor_status_ix"
+branch_labels = None
+depends_on = None
+
+
+def _remove_duplicate_integrations() -> None:
+    """Fold duplicate integrations into one row per pair so the unique index can build"""
+    # The kept integration keeps its own token; otherwise it takes the newest
+    # token among its duplicates
+    op.execute(f"""
+        DELETE FROM oauth_tokens
+        WHERE vendor_integration_id IN (
+            SELECT d.id FROM ({_DUPLICATES}) d
+            WHERE EXISTS (SELECT 1 FROM oauth_tokens t WHERE t.vendor_integration_id = d.keep_id)
+        )
+    """)
+    op.execute(f"""
+        DELETE FROM oauth_tokens
+        WHERE vendor_integration_id IN (SELECT id FROM ({_DUPLICATES}) d)
+        AND id < (
+            SELECT MAX(t.id) FROM oauth_tokens t
+            JOIN ({_DUPLICATES}) d ON d.id = t.vendor_integration_id
+            WHERE d.keep_id = (
+                SELECT d2.keep_id FROM ({_DUPLICATES}) d2
+                WHERE d2.id = oauth_tokens.vendor_integration_id
+            )
+        )
+    """)
+    op.execute(f"""
+        UPDATE oauth_tokens
+        SET vendor_integration_id = (
+            SELECT d.keep_id FROM ({_DUPLICATES}) d WHERE d.id = oauth_tokens.vendor_integration_id
+        )
+        WHERE vendor_integration_id IN (SELECT id FROM ({_DUPLICATES}) d)
+    """)
+    op.execute(f"DELETE FROM vendor_integrations WHERE id IN (SELECT id FROM ({_DUPLICATES}) d)")
+
+
+def upgrade() -> None:
+    _remove_duplicate_integrations()
+
+    if is_postgresql():
+        # Build the backing index without blocking writes, then attach it
+        create_index_concurrently(
+            "uq_vendor_integrations_user_vendor",
+            "vendor_integrations",
+            ["user_id", "vendor"],
+            unique=True,
+        )
+        op.execute(
+            "ALTER TABLE vendor_integrations ADD CONSTRAINT uq_vendor_integrations_user_vendor "
+            "UNIQUE USING INDEX uq_vendor_integrations_user_vendor"
+        )
+        # user_id lookups use the left-most column of the unique index
+        drop_index_concurrently("ix_vendor_integrations_user_id", "vendor_integrations")
+    else:
+        # SQLite cannot ALTER constraints in place; recreate the table
+        with op.batch_alter_table("vendor_integrations") as batch_op:
+            batch_op.create_unique_constraint("uq_vendor_integrations_user_vendor", ["user_id", "vendor"])
+            batch_op.drop_index("ix_vendor_integrations_user_id")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("vendor_integrations") as batch_op:
+        batch_op.create_index("ix_vendor_integrations_user_id", ["user_id"], unique=False)
+        batch_op.drop_constraint("uq_vendor_integrations_user_vendor", type_="unique")
@@ -0,0 +1,144 @@
+"""Helpers shared by Alembic migration scripts.
+
+PostgreSQL builds indexes with ``CREATE INDEX CONCURRENTLY`` so that deploys
+do not block writes to hot tables. ``CONCURRENTLY`` cannot run inside a
+transaction, so those statements are issued from an autocommit block. Other
+dialects (SQLite in local development) fall back to a plain ``CREATE INDEX``.
+
+Data migrations that rewrite rows (backfills, re-encrypting tokens) should use
+``batched_update`` so each batch commits on its own instead of holding locks
+on the whole table in one long transaction.
+"""
+
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql.elements import TextClause
+
+
+def is_postgresql() -> bool:
+    """Return True when the migration is running against PostgreSQL."""
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def create_index_concurrently(
+    index_name: str,
+    table_name: str,
+    columns: Sequence[Union[str, TextClause]],
+    unique: bool = False,
+    where: Optional[TextClause] = None,
+    include: Optional[Sequence[str]] = None,
+) -> None:
+    """
+    Create an index without blocking writes on PostgreSQL
+
+    A failed ``CREATE INDEX CONCURRENTLY`` leaves an INVALID index behind that
+    ``IF NOT EXISTS`` would silently keep, so such an index is dropped first
+    and a retried migration rebuilds it.
+
+    Args:
+        index_name: Name of the index
+        table_name: Table to index
+        columns: Column names or text expressions (e.g. ``sa.text("created_at DESC")``)
+        unique: Whether to create a unique index
+        where: Optional predicate for a partial index
+        include: Optional non-key columns to store in the index (PostgreSQL only)
+    """
+    if is_postgresql():
+        drop_invalid_index(index_name, table_name)
+        with op.get_context().autocommit_block():
+            op.create_index(
+                index_name,
+                table_name,
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+                postgresql_include=list(include or []),
+            )
+    else:
+        op.create_index(index_name, table_name, columns, unique=unique, sqlite_where=where)
+
+
+def drop_invalid_index(index_name: str, table_name: str) -> None:
+    """
+    Drop a PostgreSQL index left INVALID by an interrupted concurrent build
+
+    Args:
+        index_name: Name of the index
+        table_name: Table the index belongs to
+    """
+    # Offline mode cannot inspect the catalog
+    if not is_postgresql() or op.get_context().as_sql:
+        return
+
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :index_name AND NOT i.indisvalid"
+        ),
+        {"index_name": index_name},
+    ).scalar()
+    if invalid:
+        drop_index_concurrently(index_name, table_name)
+
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    """
+    Drop an index without blocking writes on PostgreSQL
+
+    Args:
+        index_name: Name of the index
+        table_name: Table the index belongs to
+    """
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.drop_index(index_name, table_name=table_name, if_exists=True, postgresql_concurrently=True)
+    else:
+        op.drop_index(index_name, table_name=table_name)
+
+
+def batched_update(
+    table_name: str,
+    set_clause: str,
+    where: str,
+    batch_size: int = 1000,
+    key_column: str = "id",
+) -> int:
+    """
+    Run ``UPDATE ... SET ... WHERE ...`` in independently committed batches
+
+    ``where`` must stop matching a row once it has been updated (e.g.
+    ``"vendor_user_id IS NULL"`` when backfilling ``vendor_user_id``),
+    otherwise the loop never finishes.
+
+    Args:
+        table_name: Table to update
+        set_clause: SQL assignments, e.g. ``"sync_status = 'idle'"``
+        where: SQL predicate selecting rows that still need updating
+        batch_size: Rows updated per committed batch
+        key_column: Primary key column used to pick each batch
+
+    Returns:
+        Total number of rows updated (0 in offline ``--sql`` mode)
+    """
+    statement = sa.text(
+        f"UPDATE {table_name} SET {set_clause} "
+        f"WHERE {key_column} IN ("
+        f"SELECT {key_column} FROM {table_name} WHERE {where} LIMIT :batch_size)"
+    )
+
+    # Offline mode only renders SQL, so there is no rowcount to loop on
+    if op.get_context().as_sql:
+        op.execute(f"UPDATE {table_name} SET {set_clause} WHERE {where}")
+        return 0
+
+    total = 0
+    while True:
+        with op.get_context().autocommit_block():
+            result = op.get_bind().execute(statement, {"batch_size": batch_size})
+        if not result.rowcount:
+            return total
+        total += result.rowcount
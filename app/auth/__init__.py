@@ -1,9 +1,12 @@
 from .auth import (
     verify_password, get_password_hash, create_access_token,
-    get_current_user, get_current_active_user, get_current_admin_user
+    get_current_user, get_current_active_user, get_current_admin_user,
+    Principal, get_current_principal, get_request_principal
 )
+from .middleware import AuthMiddleware
 
 __all__ = [
     "verify_password", "get_password_hash", "create_access_token",
-    "get_current_user", "get_current_active_user", "get_current_admin_user"
+    "get_current_user", "get_current_active_user", "get_current_admin_user",
+    "Principal", "get_current_principal", "get_request_principal", "AuthMiddleware"
 ]
\ No newline at end of file
@@ -1,8 +1,15 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
+import hashlib
+import threading
+import time
+from cachetools import TTLCache
 from jose import JWTError, jwt
+from jose.exceptions import ExpiredSignatureError
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import pytz
 from sqlalchemy.orm import Session
@@ -18,6 +25,22 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # JWT token security
 security = HTTPBearer()
 
+# Verified token claims, keyed by a digest of the token. Entries never outlive
+# the token's own exp (checked on every hit); rejected tokens are remembered
+# briefly so replaying a bad token does not cost a signature check each time.
+_token_claims: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_rejected_tokens: TTLCache = TTLCache(maxsize=4096, ttl=5)
+_token_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Authenticated caller, reduced to the fields permission checks need"""
+    user_id: int
+    patient_id: Optional[str]
+    is_admin: bool
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -39,30 +62,88 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a JWT signed with the app secret and return its claims
+    
+    Args:
+        token: Encoded JWT
+        
+    Returns:
+        The token's claims
+        
+    Raises:
+        JWTError: If the token is invalid or expired
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    with _token_cache_lock:
+        claims = _token_claims.get(key)
+        rejected = key in _rejected_tokens
+    
+    if rejected:
+        raise JWTError("Invalid token")
+    if claims is not None:
+        exp = claims.get("exp")
+        if exp is None or exp > time.time():
+            return claims
+        with _token_cache_lock:
+            _token_claims.pop(key, None)
+        raise ExpiredSignatureError("Signature has expired.")
+    
+    try:
+        claims = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        with _token_cache_lock:
+            _rejected_tokens[key] = True
+        raise
+    
+    with _token_cache_lock:
+        _token_claims[key] = claims
+    return claims
+
+async def decode_token_async(token: str) -> Dict[str, Any]:
+    """decode_token for async code paths, keeping slow signature checks off the event loop"""
+    # HMAC (HS*) verification is cheaper than a threadpool hop; RSA/EC is not
+    if settings.algorithm.startswith("HS"):
+        return decode_token(token)
+    return await run_in_threadpool(decode_token, token)
+
+async def encode_token_async(claims: Dict[str, Any]) -> str:
+    """Sign claims with the app secret, keeping slow signing off the event loop"""
+    if settings.algorithm.startswith("HS"):
+        return jwt.encode(claims, settings.secret_key, algorithm=settings.algorithm)
+    return await run_in_threadpool(jwt.encode, claims, settings.secret_key, algorithm=settings.algorithm)
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def _decode_token_email(token: str) -> str:
+    """Validate the bearer token and return the email it was issued for"""
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = TokenData(email=email)
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    
+    return token_data.email
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current authenticated user"""
+    email = _decode_token_email(credentials.credentials)
     
-    user = db.query(User).filter(User.email == token_data.email).first()
+    user = db.query(User).filter(User.email == email).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -78,4 +159,44 @@ async def get_current_admin_user(current_user: User = Depends(get_current_active
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+def resolve_principal(db: Session, token: str) -> Principal:
+    """Resolve a bearer token to the active user's Principal (column-only query, no ORM instance)"""
+    email = _decode_token_email(token)
+    
+    row = (
+        db.query(User.id, User.fhir_patient_id, User.is_admin, User.is_active)
+        .filter(User.email == email)
+        .first()
+    )
+    if row is None:
+        raise _credentials_exception()
+    if not row.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return Principal(user_id=row.id, patient_id=row.fhir_patient_id, is_admin=row.is_admin)
+
+async def get_current_principal(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """Get the current active user as a Principal
+    
+    Reuses the Principal AuthMiddleware already resolved for this request, if any.
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    return resolve_principal(db, credentials.credentials)
+
+def get_request_principal(request: Request) -> Principal:
+    """Get the Principal AuthMiddleware resolved for this request
+    
+    For routes under the middleware's prefixes; unlike get_current_principal
+    it pulls in no bearer-scheme or database-session dependencies.
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+    return principal
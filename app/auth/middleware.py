@@ -0,0 +1,53 @@
+from typing import Sequence
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.auth.auth import Principal, resolve_principal
+from app.database import SessionLocal
+
+
+def _resolve_principal(token: str) -> Principal:
+    """resolve_principal with a session of its own, for use off the event loop"""
+    db = SessionLocal()
+    try:
+        return resolve_principal(db, token)
+    finally:
+        db.close()
+
+
+class AuthMiddleware:
+    """
+    Authenticate requests under the given path prefixes before routing
+
+    The caller's Principal is stored on ``request.state.principal``, so
+    routes read it through get_request_principal instead of querying the
+    user again. The lookup is blocking, so it runs in the threadpool.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefixes: Sequence[str]):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+        try:
+            # Same answer HTTPBearer gives for a missing or non-bearer header
+            if scheme.lower() != "bearer" or not token:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+
+            principal = await run_in_threadpool(_resolve_principal, token)
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["principal"] = principal
+        await self.app(scope, receive, send)
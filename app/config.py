@@ -1,48 +1,79 @@
-from pydantic_settings import BaseSettings
-from typing import Optional
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
+    """Application settings, read from the environment and .env"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
     # Database
-    database_url: str = os.getenv("DATABASE_URL", "sqlite:///./phr.db")
+    database_url: str = "sqlite:///./phr.db"
+    # How the API applies migrations on startup: sync | skip
+    # (use "skip" when scripts/migrate.py runs before the workers start)
+    migration_mode: Literal["sync", "skip"] = "sync"
+    # Connection pool (ignored for SQLite, which opens a connection per session)
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle_seconds: int = 1800
     
     # JWT
-    secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-    algorithm: str = os.getenv("ALGORITHM", "HS256")
-    access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    secret_key: str = "your-secret-key-change-in-production"
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 30
     
     # FHIR
-    fhir_base_url: str = os.getenv("FHIR_BASE_URL", "http://localhost:8080/fhir")
+    fhir_base_url: str = "http://localhost:8080/fhir"
+    # Upper bound on requests in flight to the FHIR server per API process
+    fhir_max_concurrent_requests: int = 100
+    # Seconds a cached FHIR read stays fresh (per user)
+    fhir_cache_ttl_seconds: int = 30
+    # Seconds past freshness a read is served while refreshing in the background
+    fhir_cache_stale_seconds: int = 60
+    # Seconds past freshness a read is kept to serve if the FHIR server is down
+    fhir_cache_fallback_seconds: int = 3600
+
+    # Redis (response cache); leave empty to disable caching
+    redis_url: str = ""
     
     # Fitbit OAuth
-    fitbit_client_id: str = os.getenv("FITBIT_CLIENT_ID", "")
-    fitbit_client_secret: str = os.getenv("FITBIT_CLIENT_SECRET", "")
-    fitbit_redirect_uri: str = os.getenv("FITBIT_REDIRECT_URI", "http://localhost:8000/integrations/fitbit/callback")
+    fitbit_client_id: str = ""
+    fitbit_client_secret: str = ""
+    fitbit_redirect_uri: str = "http://localhost:8000/integrations/fitbit/callback"
     fitbit_oauth_url: str = "https://www.fitbit.com/oauth2/authorize"
     fitbit_token_url: str = "https://api.fitbit.com/oauth2/token"
     fitbit_api_url: str = "https://api.fitbit.com"
     
     # Encryption key for storing OAuth tokens (should be 32 bytes for Fernet)
-    encryption_key: str = os.getenv("ENCRYPTION_KEY", "")
+    encryption_key: str = ""
     
     # Admin
-    admin_email: str = os.getenv("ADMIN_EMAIL", "admin@phr.com")
-    admin_password: str = os.getenv("ADMIN_PASSWORD", "admin123")
+    admin_email: str = "admin@phr.com"
+    admin_password: str = "admin123"
+    # Ensure the admin user exists on startup (always skipped in production)
+    bootstrap_admin: bool = True
     
     # Environment
-    environment: str = os.getenv("ENVIRONMENT", "development")
+    environment: str = "development"
+
+    # CORS: comma-separated list of allowed browser origins
+    cors_origins: str = "http://localhost:3000"
 
     # Sync worker
-    sync_poll_interval_seconds: int = int(os.getenv("SYNC_POLL_INTERVAL_SECONDS", "3"))
+    sync_poll_interval_seconds: int = 3
     # How often the worker checks whether it should enqueue scheduled syncs
-    sync_schedule_tick_seconds: int = int(os.getenv("SYNC_SCHEDULE_TICK_SECONDS", "60"))
+    sync_schedule_tick_seconds: int = 60
     # Minimum hours between scheduled sync runs per integration
-    sync_scheduled_min_hours_between_runs: int = int(os.getenv("SYNC_SCHEDULED_MIN_HOURS_BETWEEN_RUNS", "24"))
-    
-    class Config:
-        env_file = ".env"
+    sync_scheduled_min_hours_between_runs: int = 24
+    # Manual sync requests reuse a queued/running job; a job running longer than
+    # this is presumed dead and no longer blocks new ones
+    sync_job_stale_after_seconds: int = 1800
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Return the process-wide settings, parsed once"""
+    return Settings()
+
 
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
\ No newline at end of file
@@ -1,12 +1,28 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+if "sqlite" in settings.database_url:
+    engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        poolclass=NullPool,
+    )
+else:
+    engine = create_engine(
+        settings.database_url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        # Transparently replace connections the server has dropped
+        pool_pre_ping=True,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        # Reuse the most recently returned connection so surplus ones sit idle
+        # and are reclaimed by server/PgBouncer idle timeouts
+        pool_use_lifo=True,
+        connect_args={"application_name": "phr-backend"} if settings.database_url.startswith("postgresql") else {},
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,84 +1,172 @@
+import asyncio
 import httpx
-import json
-from typing import Dict, Any, Optional, List
+import orjson
+from typing import Dict, Any, Optional, List, Sequence, Tuple, Union
 from fastapi import HTTPException, status
 from app.config import settings
 
+_SUPPORTED_METHODS = frozenset({"GET", "POST", "PUT", "DELETE"})
+_BODY_METHODS = frozenset({"POST", "PUT"})
+# Answers from servers that do not accept batch Bundles at the base URL
+_NO_BATCH_STATUSES = frozenset({404, 405, 501})
+# Asks the server to answer writes with status only, without echoing each resource
+_RETURN_MINIMAL = "return=minimal"
+
+# A mapping, or (name, value) pairs when a FHIR search repeats a parameter
+QueryParams = Union[Dict[str, str], Sequence[Tuple[str, str]]]
+
 class FHIRClient:
     def __init__(self):
-        self.base_url = settings.fhir_base_url
+        # Parsed once; the trailing slash makes relative endpoints join under /fhir/
+        self.base_url = httpx.URL(settings.fhir_base_url.rstrip("/") + "/")
         self.timeout = 30.0
+        self._client: Optional[httpx.AsyncClient] = None
+        # Identical GETs already in flight, keyed by URL; later callers share the result
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._semaphore = asyncio.Semaphore(settings.fhir_max_concurrent_requests)
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client shared by all FHIR requests"""
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            # Idle connections stay open for a minute so bursts skip TCP/TLS setup
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=60.0),
+            headers={
+                "Content-Type": "application/fhir+json",
+                "Accept": "application/fhir+json",
+                # Bundles are repetitive JSON; httpx decodes both transparently
+                "Accept-Encoding": "gzip, br"
+            },
+            # Concurrent requests multiplex over one connection
+            http2=True,
+        )
+    
+    async def startup(self) -> None:
+        """Open the shared HTTP client (called from the app lifespan)"""
+        if self._client is None:
+            self._client = self._build_client()
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client (called from the app lifespan)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, opened lazily when used outside the app lifespan"""
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
     
     async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
         data: Optional[Dict[str, Any]] = None,
-        params: Optional[Dict[str, str]] = None
+        params: Optional[QueryParams] = None,
+        headers: Optional[Dict[str, str]] = None
     ) -> Dict[str, Any]:
-        """Make HTTP request to FHIR server"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        """
+        Make HTTP request to FHIR server
         
-        headers = {
-            "Content-Type": "application/fhir+json",
-            "Accept": "application/fhir+json"
-        }
+        Concurrent identical GETs are coalesced into one upstream request, so
+        callers must treat the returned dict as read-only.
+        """
+        url = endpoint.lstrip('/')
+        method = method.upper()
+        if method not in _SUPPORTED_METHODS:
+            raise HTTPException(
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+                detail=f"Method {method} not supported"
+            )
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                if method.upper() == "GET":
-                    response = await client.get(url, headers=headers, params=params)
-                elif method.upper() == "POST":
-                    response = await client.post(url, headers=headers, json=data)
-                elif method.upper() == "PUT":
-                    response = await client.put(url, headers=headers, json=data)
-                elif method.upper() == "DELETE":
-                    response = await client.delete(url, headers=headers)
-                else:
-                    raise HTTPException(
-                        status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
-                        detail=f"Method {method} not supported"
-                    )
-                
-                # Handle FHIR server responses
-                if response.status_code == 200 or response.status_code == 201:
-                    try:
-                        return response.json()
-                    except json.JSONDecodeError:
-                        return {"message": "Success", "status_code": response.status_code}
-                elif response.status_code == 404:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail="Resource not found in FHIR server"
-                    )
-                elif response.status_code >= 400:
-                    try:
-                        error_detail = response.json()
-                    except:
-                        error_detail = {"message": f"FHIR server error: {response.status_code}"}
-                    
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"FHIR server error: {error_detail}"
-                    )
-                
-                return response.json()
-                
-            except httpx.TimeoutException:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="FHIR server timeout"
-                )
-            except httpx.ConnectError:
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="Cannot connect to FHIR server"
+        if method != "GET" or headers:
+            return await self._send(method, url, data, params, headers)
+        
+        key = str(httpx.URL(url).copy_merge_params(params or {}))
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._send(method, url, data, params, headers))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # One caller being cancelled must not cancel the request for the others
+        return await asyncio.shield(inflight)
+    
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict[str, Any]],
+        params: Optional[QueryParams],
+        headers: Optional[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        """Send one request, mapping FHIR server errors to HTTPExceptions"""
+        return self._parse_body(await self._request(method, url, data, params, headers))
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict[str, Any]],
+        params: Optional[QueryParams],
+        headers: Optional[Dict[str, str]]
+    ) -> httpx.Response:
+        """Send one request and return the raw successful response"""
+        try:
+            async with self._semaphore:
+                response = await self.client.request(
+                    method,
+                    url,
+                    params=params,
+                    # Encoded with orjson; the Content-Type header is set on the client
+                    content=orjson.dumps(data) if method in _BODY_METHODS and data is not None else None,
+                    headers=headers
                 )
-            except Exception as e:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
                 raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"FHIR client error: {str(e)}"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Resource not found in FHIR server"
                 )
+            try:
+                error_detail = orjson.loads(e.response.content)
+            except orjson.JSONDecodeError:
+                error_detail = {"message": f"FHIR server error: {e.response.status_code}"}
+            
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"FHIR server error: {error_detail}"
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="FHIR server timeout"
+            )
+        except httpx.ConnectError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Cannot connect to FHIR server"
+            )
+        except httpx.HTTPError as e:
+            # Dropped connections, protocol errors, read/write errors
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"FHIR server request failed: {type(e).__name__}"
+            )
+        
+        return response
+    
+    @staticmethod
+    def _parse_body(response: httpx.Response) -> Dict[str, Any]:
+        """Decode a successful response body"""
+        # e.g. DELETE answers 200/204 with an empty body
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            return {"message": "Success", "status_code": response.status_code}
     
     async def create_patient(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new Patient resource"""
@@ -109,17 +197,135 @@ class FHIRClient:
         """Get Observation resource by ID"""
         return await self._make_request("GET", f"Observation/{observation_id}")
     
-    async def search_resources(self, resource_type: str, **params) -> Dict[str, Any]:
-        """Generic search for any FHIR resource type"""
-        return await self._make_request("GET", resource_type, params=params)
+    async def search_resources(
+        self, resource_type: str, multi_params: Sequence[Tuple[str, str]] = (), **params
+    ) -> Dict[str, Any]:
+        """Generic search for any FHIR resource type
+        
+        ``multi_params`` are forwarded verbatim, so repeated parameters
+        (e.g. code=A&code=B) survive; keyword ``params`` are appended.
+        """
+        query_params = [*multi_params, *params.items()] if multi_params else params
+        return await self._make_request("GET", resource_type, params=query_params)
     
     async def create_resource(self, resource_type: str, resource_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create any FHIR resource"""
         return await self._make_request("POST", resource_type, resource_data)
     
-    async def get_resource(self, resource_type: str, resource_id: str) -> Dict[str, Any]:
-        """Get any FHIR resource by type and ID"""
-        return await self._make_request("GET", f"{resource_type}/{resource_id}")
+    async def get_resource(
+        self, resource_type: str, resource_id: str, elements: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get any FHIR resource by type and ID, optionally only the given ``_elements``"""
+        params = {"_elements": elements} if elements else None
+        return await self._make_request("GET", f"{resource_type}/{resource_id}", params=params)
+    
+    async def get_compartment_resource(
+        self, patient_id: str, resource_type: str, resource_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get a resource by ID within a Patient compartment, or None if it is not in it"""
+        bundle = await self._make_request(
+            "GET", f"Patient/{patient_id}/{resource_type}", params={"_id": resource_id}
+        )
+        for entry in bundle.get("entry", []):
+            resource = entry.get("resource", {})
+            if resource.get("resourceType") == resource_type and resource.get("id") == resource_id:
+                return resource
+        return None
+    
+    async def post_bundle(
+        self,
+        resources: List[Dict[str, Any]],
+        bundle_type: str = "transaction",
+        conditional: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Create many resources in a single round-trip via a Bundle POST
+        
+        Args:
+            resources: FHIR resources to create
+            bundle_type: "transaction" (all-or-nothing) or "batch" (per-entry
+                results; sent as concurrent single POSTs if the server rejects batches)
+            conditional: Add If-None-Exist on the first identifier so existing
+                resources are matched instead of duplicated
+            
+        Returns:
+            The response Bundle; its entries are in the same order as ``resources``
+            and carry only ``response`` (created resources are not echoed back)
+        """
+        entries = []
+        for resource in resources:
+            request = {"method": "POST", "url": resource["resourceType"]}
+            if conditional:
+                identifier = (resource.get("identifier") or [{}])[0]
+                if identifier.get("system") and identifier.get("value"):
+                    request["ifNoneExist"] = f"identifier={identifier['system']}|{identifier['value']}"
+            entries.append({"resource": resource, "request": request})
+        
+        if bundle_type == "batch":
+            # Falls back to concurrent single POSTs on servers without batch support
+            entries = await self.batch(entries, prefer=_RETURN_MINIMAL)
+            return {"resourceType": "Bundle", "type": "batch-response", "entry": entries}
+        
+        bundle = {"resourceType": "Bundle", "type": bundle_type, "entry": entries}
+        return await self._make_request("POST", "", bundle, headers={"Prefer": _RETURN_MINIMAL})
+    
+    async def batch(
+        self, entries: List[Dict[str, Any]], prefer: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Send several requests as one batch Bundle
+        
+        Servers without batch support get the entries as concurrent
+        individual requests instead, with results shaped the same way.
+        
+        Args:
+            entries: Bundle entries, each with a ``request`` (method, url) and
+                an optional ``resource``
+            prefer: Optional ``Prefer`` header, e.g. "return=minimal" to skip
+                resource bodies in the response
+            
+        Returns:
+            The batch-response entries (``response`` plus ``resource``), in order
+        """
+        bundle = {"resourceType": "Bundle", "type": "batch", "entry": entries}
+        headers = {"Prefer": prefer} if prefer else None
+        try:
+            result = await self._make_request("POST", "", bundle, headers=headers)
+            if result.get("resourceType") == "Bundle":
+                return result.get("entry", [])
+        except HTTPException as e:
+            if e.status_code not in _NO_BATCH_STATUSES:
+                raise
+        
+        return list(await asyncio.gather(*(self._send_batch_entry(entry, prefer) for entry in entries)))
+    
+    async def _send_batch_entry(self, entry: Dict[str, Any], prefer: Optional[str] = None) -> Dict[str, Any]:
+        """Send one batch entry on its own, returning a batch-response entry"""
+        request = entry["request"]
+        headers = {"Prefer": prefer} if prefer else {}
+        if request.get("ifNoneExist"):
+            headers["If-None-Exist"] = request["ifNoneExist"]
+        try:
+            # Sent directly rather than through _make_request so the real status
+            # survives, e.g. 200 when a conditional create matched an existing resource
+            response = await self._request(
+                request["method"].upper(), request["url"].lstrip("/"), entry.get("resource"), None, headers or None
+            )
+        except HTTPException as e:
+            return {
+                "response": {
+                    "status": str(e.status_code),
+                    "outcome": {
+                        "resourceType": "OperationOutcome",
+                        "issue": [{"severity": "error", "code": "processing", "diagnostics": str(e.detail)}]
+                    }
+                }
+            }
+        
+        return {
+            "response": {"status": f"{response.status_code} {response.reason_phrase}".rstrip()},
+            "resource": self._parse_body(response)
+        }
     
     # Condition-specific methods
     async def create_condition(self, condition_data: Dict[str, Any]) -> Dict[str, Any]:
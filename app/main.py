@@ -1,12 +1,13 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
 
+from app.auth import AuthMiddleware
 from app.config import settings
-from app.database import engine, get_db
-from app.models import User, VendorIntegration, OAuthToken
-from app.models.user import Base
+from app.database import get_db
+from app.migrations import run_migrations
 from app.routers import (
     auth_router,
     users_router,
@@ -20,9 +21,12 @@ from app.workers.sync_worker import sync_worker
 import asyncio
 from app.services.user_service import user_service
 from app.fhir.client import fhir_client
+from app.services.cache_service import cache_service
+from app.services.fitbit_service import fitbit_service
 import httpx
 import logging
 import sys
+import time
 
 # Configure application logging to show INFO-level logs in terminal
 logging.basicConfig(
@@ -30,16 +34,15 @@ logging.basicConfig(
     format="[%(asctime)s] %(levelname)s %(name)s: %(message)s",
     handlers=[logging.StreamHandler(sys.stdout)],
 )
+logger = logging.getLogger(__name__)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Application lifespan context manager"""
-    # Startup
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+def _bootstrap_admin() -> None:
+    """Create the admin user if it doesn't exist"""
+    # Every worker would otherwise repeat this lookup on each boot
+    if settings.environment == "production" or not settings.bootstrap_admin:
+        return
 
-    # Create admin user if it doesn't exist
     db = next(get_db())
     try:
         admin_user = user_service.get_user_by_email(db, settings.admin_email)
@@ -58,6 +61,32 @@ async def lifespan(app: FastAPI):
     finally:
         db.close()
 
+
+async def _prepare_database() -> None:
+    """Apply migrations off the event loop, then bootstrap the admin user"""
+    await asyncio.to_thread(run_migrations)
+    await asyncio.to_thread(_bootstrap_admin)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan context manager"""
+    # Startup
+    if settings.migration_mode == "sync":
+        # Serve (and start the sync worker) only against a migrated schema
+        try:
+            await _prepare_database()
+        except Exception:
+            logger.exception("Database migrations failed; aborting startup")
+            raise
+    else:
+        await asyncio.to_thread(_bootstrap_admin)
+
+    # Open the pooled FHIR and Fitbit HTTP clients and the response cache
+    await fhir_client.startup()
+    await fitbit_service.startup()
+    await cache_service.startup()
+
     # Start background sync worker
     worker_task = asyncio.create_task(sync_worker.run_forever())
 
@@ -74,6 +103,10 @@ async def lifespan(app: FastAPI):
         # task cancellation or worker shutdown
         pass
 
+    await fhir_client.aclose()
+    await fitbit_service.aclose()
+    await cache_service.aclose()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -81,15 +114,22 @@ app = FastAPI(
     description="Personal Health Record Backend with FHIR Integration",
     version="1.0.0",
     lifespan=lifespan,
+    # FHIR Bundles make JSON encoding a hot path; orjson is several times faster
+    default_response_class=ORJSONResponse,
 )
 
+# Authenticate FHIR requests once, before routing (added first so CORS wraps it)
+app.add_middleware(AuthMiddleware, path_prefixes=["/fhir"])
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=[origin.strip() for origin in settings.cors_origins.split(",") if origin.strip()],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    # Let browsers cache preflight responses for a day
+    max_age=86400,
 )
 
 # Include routers
@@ -113,35 +153,62 @@ async def root():
     }
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint with FHIR connection status"""
-    health_status = {
-        "status": "healthy",
-        "database": "connected",
-        "fhir": {"url": settings.fhir_base_url, "status": "unknown"},
-    }
+# Last FHIR connectivity probe result, reused by /health for a short TTL so
+# frequent liveness checks don't hammer the FHIR server
+FHIR_HEALTH_CACHE_SECONDS = 10.0
+FHIR_HEALTH_PROBE_TIMEOUT_SECONDS = 2.0
+_fhir_health_cache = {"ts": 0.0, "status": "unknown", "probe": None}
+
 
-    # Check FHIR server connection
+async def _probe_fhir() -> str:
+    """Probe the FHIR server and cache the resulting connection status"""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{settings.fhir_base_url}/metadata")
-            if response.status_code == 200:
-                health_status["fhir"]["status"] = "connected"
-            else:
-                health_status["fhir"]["status"] = "unreachable"
-                health_status["status"] = "degraded"
+        # HEAD avoids downloading the (large) CapabilityStatement body
+        response = await fhir_client.client.head("metadata", timeout=5.0)
+        if response.status_code in (200, 405):
+            fhir_status = "connected"
+        else:
+            fhir_status = "unreachable"
     except httpx.TimeoutException:
-        health_status["fhir"]["status"] = "timeout"
-        health_status["status"] = "degraded"
+        fhir_status = "timeout"
     except httpx.ConnectError:
-        health_status["fhir"]["status"] = "disconnected"
-        health_status["status"] = "degraded"
+        fhir_status = "disconnected"
     except Exception as e:
-        health_status["fhir"]["status"] = f"error: {str(e)}"
-        health_status["status"] = "degraded"
+        fhir_status = f"error: {str(e)}"
+
+    _fhir_health_cache["status"] = fhir_status
+    _fhir_health_cache["ts"] = time.monotonic()
+    return fhir_status
+
+
+async def _get_fhir_status() -> str:
+    """Return the cached FHIR status, refreshing it when stale"""
+    if time.monotonic() - _fhir_health_cache["ts"] < FHIR_HEALTH_CACHE_SECONDS:
+        return _fhir_health_cache["status"]
+
+    # Share one in-flight probe between concurrent health checks; shield it so
+    # a slow probe still completes and refreshes the cache after we time out
+    probe = _fhir_health_cache["probe"]
+    if probe is None or probe.done():
+        probe = asyncio.create_task(_probe_fhir())
+        _fhir_health_cache["probe"] = probe
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(probe), FHIR_HEALTH_PROBE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return "timeout"
 
-    return health_status
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint with FHIR connection status"""
+    fhir_status = await _get_fhir_status()
+
+    return {
+        "status": "healthy" if fhir_status == "connected" else "degraded",
+        "database": "connected",
+        "fhir": {"url": settings.fhir_base_url, "status": fhir_status},
+    }
 
 
 if __name__ == "__main__":
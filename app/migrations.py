@@ -0,0 +1,61 @@
+"""
+Database schema migrations
+
+Runs Alembic programmatically so the API lifespan and the standalone
+``scripts/migrate.py`` entry point share a single code path.
+"""
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.config import settings
+from app.database import Base, engine
+import app.models  # noqa: F401 - registers every model on Base.metadata
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = Path(__file__).resolve().parent.parent / "alembic"
+
+# Schema that create_all produced before startup ran migrations
+BASELINE_REVISION = "add_sync_metadata_and_jobs"
+
+
+def get_alembic_config() -> Config:
+    """Build an Alembic config pointing at the app's database"""
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    # ConfigParser treats "%" as interpolation syntax
+    config.set_main_option("sqlalchemy.url", settings.database_url.replace("%", "%%"))
+    return config
+
+
+def run_migrations() -> None:
+    """
+    Bring the database schema up to the latest Alembic revision
+
+    Databases without an ``alembic_version`` table come in two kinds:
+
+    - empty: created from the models and stamped at head, since the
+      revision chain only alters tables that already exist;
+    - built by ``create_all`` before migrations ran at startup: their schema
+      matches BASELINE_REVISION, so they are stamped there and upgraded, which
+      applies every index and constraint added since.
+    """
+    config = get_alembic_config()
+    table_names = set(inspect(engine).get_table_names())
+
+    if "alembic_version" not in table_names:
+        if table_names.isdisjoint(Base.metadata.tables):
+            logger.info("Empty database: creating tables and stamping head")
+            Base.metadata.create_all(bind=engine)
+            command.stamp(config, "head")
+            return
+
+        logger.info(f"Unversioned database: stamping {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+
+    logger.info("Applying database migrations")
+    command.upgrade(config, "head")
@@ -10,7 +10,7 @@ from __future__ import annotations
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, Integer, String, ForeignKey
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Index, text
 from sqlalchemy.sql import func
 
 from app.database import Base
@@ -18,11 +18,37 @@ from app.database import Base
 
 class SyncJob(Base):
     __tablename__ = "sync_jobs"
+    __table_args__ = (
+        # Partial index over the active queue used by the worker's claim poll
+        Index(
+            "ix_sync_jobs_queue",
+            "created_at",
+            "id",
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+        # Covers "active/latest job for this user + vendor" lookups in one scan
+        Index(
+            "ix_sync_jobs_user_vendor_status",
+            "user_id",
+            "vendor",
+            "status",
+            text("created_at DESC"),
+            postgresql_include=["id", "finished_at", "last_error"],
+        ),
+        # Newest job per vendor regardless of status (get_latest_job, sync status)
+        Index(
+            "ix_sync_jobs_user_vendor_created",
+            "user_id",
+            "vendor",
+            text("created_at DESC"),
+        ),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid4()))
 
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    vendor = Column(String, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    vendor = Column(String, nullable=False)
 
     # manual | scheduled
     trigger = Column(String, nullable=False, default="manual")
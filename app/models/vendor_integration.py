@@ -1,6 +1,6 @@
 """Database models for vendor integrations and OAuth tokens."""
 
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -12,9 +12,13 @@ class VendorIntegration(Base):
     Tracks which vendors each user has connected
     """
     __tablename__ = "vendor_integrations"
+    __table_args__ = (
+        # One connection per user per vendor; also serves user_id lookups
+        UniqueConstraint("user_id", "vendor", name="uq_vendor_integrations_user_vendor"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     vendor = Column(String, nullable=False)  # e.g., "fitbit", "apple_health", etc.
     is_active = Column(Boolean, default=True)
     last_sync_at = Column(DateTime(timezone=True), nullable=True)
@@ -47,7 +51,7 @@ class OAuthToken(Base):
     id = Column(Integer, primary_key=True, index=True)
     vendor_integration_id = Column(Integer, ForeignKey("vendor_integrations.id"), nullable=False, index=True)
     
-    # Encrypted token data (using Fernet encryption)
+    # Encrypted token data (AES-GCM; see app/services/encryption.py)
     encrypted_access_token = Column(Text, nullable=False)
     encrypted_refresh_token = Column(Text, nullable=True)
     
@@ -1,147 +1,377 @@
-from typing import Dict, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional, Callable, Awaitable, Literal, Set, Union
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, Header
+import asyncio
+import hashlib
+import logging
+import time
+from urllib.parse import parse_qsl, urlencode
 
-from app.database import get_db
+from app.config import settings
 from app.fhir.client import fhir_client
-from app.auth.auth import get_current_active_user
-from app.models.user import User
-from app.schemas.fhir import FHIRCondition
+from app.auth.auth import Principal, get_request_principal
+from app.schemas.fhir import FHIRBatchEntry, FHIRBatchRequest, FHIRCondition
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on _count so one search cannot pull an unbounded page
+MAX_SEARCH_COUNT = 200
+
+# Resource types whose searches are limited to the caller's own patient
+_COMPARTMENT_TYPES = frozenset({"Observation", "Condition", "MedicationRequest", "Procedure"})
+
+# Defaults for new Conditions; shared by reference since request bodies are
+# only serialised to the FHIR server, never mutated afterwards
+_DEFAULT_CONDITION_CLINICAL_STATUS = {
+    "coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/condition-clinical",
+        "code": "active",
+        "display": "Active"
+    }]
+}
+_DEFAULT_CONDITION_CATEGORY = [{
+    "coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/condition-category",
+        "code": "problem-list-item",
+        "display": "Problem List Item"
+    }]
+}]
+
+# How long a Condition -> owning patient mapping is kept; it only picks the
+# cache tags to invalidate, never authorizes a write
+CONDITION_OWNER_TTL_SECONDS = 600
 
 router = APIRouter(prefix="/fhir", tags=["FHIR"])
 
+
+def _cache_scope(principal: Principal) -> Optional[str]:
+    """Cache tag covering a user's FHIR reads, or None if they are not cached"""
+    # Admins can read any patient's data; their reads always go upstream
+    if principal.is_admin:
+        return None
+    if principal.patient_id:
+        return f"patient:{principal.patient_id}"
+    return f"user:{principal.user_id}"
+
+
+def _cache_key(request: Request, principal: Principal) -> str:
+    """Per-user key for a read: path plus sorted query parameters"""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"fhir:{principal.user_id}:{request.url.path}?{query}"
+
+
+# Background stale-while-revalidate refreshes; strong refs keep tasks alive
+_refresh_tasks: Set[asyncio.Task] = set()
+_refresh_keys: Set[str] = set()
+
+
+async def _store_read(key: str, scope: str, body: Dict[str, Any]) -> None:
+    """Cache a FHIR read along with the time it stops being fresh"""
+    entry = {"body": body, "stale_at": time.time() + settings.fhir_cache_ttl_seconds}
+    # Kept past staleness so it can still be served if the FHIR server is down
+    ttl = settings.fhir_cache_ttl_seconds + settings.fhir_cache_fallback_seconds
+    await cache_service.set_json(key, entry, ttl, tags=[scope])
+
+
+async def _refresh_read(key: str, scope: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+    """Re-fetch a stale read in the background; on failure the stale copy stays"""
+    try:
+        await _store_read(key, scope, await fetch())
+    except Exception as e:
+        logger.warning(f"Background refresh of {key} failed: {e}")
+    finally:
+        _refresh_keys.discard(key)
+
+
+def _etag(body: Dict[str, Any]) -> str:
+    """Weak ETag for a FHIR read: the resource version, or a digest of a Bundle's entry versions"""
+    if body.get("resourceType") != "Bundle":
+        meta = body.get("meta") or {}
+        version = meta.get("versionId") or meta.get("lastUpdated")
+        if version:
+            return f'W/"{version}"'
+        return f'W/"{hashlib.blake2b(repr(body).encode(), digest_size=16).hexdigest()}"'
+    
+    digest = hashlib.blake2b(str(body.get("total")).encode(), digest_size=16)
+    for entry in body.get("entry", []):
+        resource = entry.get("resource") or {}
+        meta = resource.get("meta") or {}
+        version = meta.get("versionId") or meta.get("lastUpdated") or repr(resource)
+        digest.update(f"{resource.get('resourceType')}/{resource.get('id')}/{version}\n".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+async def _cached_read(
+    request: Request,
+    response: Response,
+    principal: Principal,
+    fetch: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Union[Dict[str, Any], Response]:
+    """
+    Serve a FHIR read as a conditional GET
+    
+    The body carries an ETag and a private Cache-Control (it is PHI); a
+    matching If-None-Match gets an empty 304 instead.
+    """
+    body = await _read_through_cache(request, response, principal, fetch)
+    
+    etag = _etag(body)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = f"private, max-age={settings.fhir_cache_ttl_seconds}"
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers))
+    return body
+
+
+async def _read_through_cache(
+    request: Request,
+    response: Response,
+    principal: Principal,
+    fetch: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Serve a FHIR read from the per-user cache with stale-while-revalidate
+    
+    - fresh entry: returned as-is
+    - stale for less than FHIR_CACHE_STALE_SECONDS: returned immediately while
+      a background task refreshes it
+    - older: fetched again, but if the FHIR server errors (5xx, timeout,
+      unreachable) the old copy is served instead of the error
+    
+    The X-Cache response header reports which path was taken.
+    """
+    scope = _cache_scope(principal)
+    if scope is None:
+        return await fetch()
+    
+    key = _cache_key(request, principal)
+    entry = await cache_service.get_json(key)
+    now = time.time()
+    
+    if entry is not None and now < entry["stale_at"]:
+        response.headers["X-Cache"] = "hit"
+        return entry["body"]
+    
+    if entry is not None and now < entry["stale_at"] + settings.fhir_cache_stale_seconds:
+        if key not in _refresh_keys:
+            _refresh_keys.add(key)
+            task = asyncio.create_task(_refresh_read(key, scope, fetch))
+            _refresh_tasks.add(task)
+            task.add_done_callback(_refresh_tasks.discard)
+        response.headers["X-Cache"] = "stale"
+        return entry["body"]
+    
+    try:
+        result = await fetch()
+    except HTTPException as e:
+        if entry is None or e.status_code < 500:
+            raise
+        logger.warning(f"FHIR read failed ({e.status_code}); serving cached {key}")
+        response.headers["X-Cache"] = "fallback"
+        return entry["body"]
+    
+    response.headers["X-Cache"] = "miss"
+    await _store_read(key, scope, result)
+    return result
+
+
+def _subject_patient_id(resource: Dict[str, Any]) -> Optional[str]:
+    """Patient ID from a resource's subject reference, if it points at a Patient"""
+    reference = (resource.get("subject") or {}).get("reference", "")
+    return reference[len("Patient/"):] if reference.startswith("Patient/") else None
+
+
+def _assert_own_or_admin(principal: Principal, patient_id: Optional[str], action: str) -> None:
+    """Raise 403 unless the principal may act on the given patient's data"""
+    own_patient_id = principal.patient_id
+    if own_patient_id and own_patient_id != patient_id and not principal.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not enough permissions to {action}"
+        )
+
+
+async def _read_scoped(principal: Principal, resource_type: str, resource_id: str, action: str) -> Dict[str, Any]:
+    """
+    Read a resource by ID, letting the FHIR server enforce patient scoping
+    
+    Patient-scoped users read through their Patient compartment, so another
+    patient's resource never leaves the FHIR server; a miss there is a 403.
+    """
+    if principal.is_admin or not principal.patient_id:
+        return await fhir_client.get_resource(resource_type, resource_id)
+    
+    resource = await fhir_client.get_compartment_resource(principal.patient_id, resource_type, resource_id)
+    if resource is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not enough permissions to {action}"
+        )
+    return resource
+
+
+def _condition_owner_key(condition_id: str) -> str:
+    return f"fhir:condition-patient:{condition_id}"
+
+
+async def _remember_condition_owners(*conditions: Dict[str, Any]) -> None:
+    """Cache which patient each Condition belongs to, so admin mutations can skip a pre-read"""
+    owners = {}
+    for condition in conditions:
+        patient_id = _subject_patient_id(condition)
+        if condition.get("id") and patient_id:
+            owners[_condition_owner_key(condition["id"])] = patient_id
+    await cache_service.set_many_json(owners, CONDITION_OWNER_TTL_SECONDS)
+
+
+async def _condition_owner(condition_id: str, authorize: bool) -> Optional[str]:
+    """Patient owning a Condition
+    
+    A permission check reads the current subject from FHIR, since the cached
+    mapping can be stale if the subject changed elsewhere; otherwise the
+    cached mapping (or None) is enough to pick the cache tags to drop.
+    """
+    if not authorize:
+        return await cache_service.get_json(_condition_owner_key(condition_id))
+    
+    # Only the subject is needed, so the server can leave out the rest
+    existing_condition = await fhir_client.get_resource("Condition", condition_id, elements="id,subject")
+    await _remember_condition_owners(existing_condition)
+    return _subject_patient_id(existing_condition)
+
+
+async def _invalidate_cache(principal: Principal, *patient_ids: Optional[str]) -> None:
+    """Drop cached reads made stale by a write to the given patients' data"""
+    patient_ids = {patient_id for patient_id in (*patient_ids, principal.patient_id) if patient_id}
+    # /observations pages are tagged separately from the FHIR reads
+    tags = {f"{prefix}:{patient_id}" for patient_id in patient_ids for prefix in ("patient", "observations")}
+    scope = _cache_scope(principal)
+    if scope:
+        tags.add(scope)
+    await cache_service.invalidate_tags(*tags)
+
+
 @router.post("/Patient")
 async def create_patient(
     patient_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user)
+    principal: Principal = Depends(get_request_principal)
 ):
     """Create a new Patient resource in FHIR server"""
     # Ensure resource type is set
     patient_data["resourceType"] = "Patient"
     
-    return await fhir_client.create_patient(patient_data)
+    result = await fhir_client.create_patient(patient_data)
+    await _invalidate_cache(principal)
+    return result
 
 @router.get("/Patient/{patient_id}")
 async def get_patient(
     patient_id: str,
-    current_user: User = Depends(get_current_active_user)
+    request: Request,
+    response: Response,
+    principal: Principal = Depends(get_request_principal)
 ):
     """Get Patient resource by ID from FHIR server"""
     # Check if user is accessing their own patient record (if fhir_patient_id is set)
-    if current_user.fhir_patient_id and current_user.fhir_patient_id != patient_id:
-        if not current_user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to access this patient record"
-            )
+    _assert_own_or_admin(principal, patient_id, "access this patient record")
     
-    return await fhir_client.get_patient(patient_id)
+    return await _cached_read(request, response, principal, lambda: fhir_client.get_patient(patient_id))
 
 @router.put("/Patient/{patient_id}")
 async def update_patient(
     patient_id: str,
     patient_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user)
+    principal: Principal = Depends(get_request_principal)
 ):
     """Update Patient resource in FHIR server"""
     # Check permissions
-    if current_user.fhir_patient_id and current_user.fhir_patient_id != patient_id:
-        if not current_user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to update this patient record"
-            )
+    _assert_own_or_admin(principal, patient_id, "update this patient record")
     
     # Ensure resource type and ID are set
     patient_data["resourceType"] = "Patient"
     patient_data["id"] = patient_id
     
-    return await fhir_client.update_patient(patient_id, patient_data)
+    result = await fhir_client.update_patient(patient_id, patient_data)
+    await _invalidate_cache(principal, patient_id)
+    return result
 
 @router.post("/Observation")
 async def create_observation(
     observation_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user)
+    principal: Principal = Depends(get_request_principal)
 ):
     """Create a new Observation resource in FHIR server"""
     # Ensure resource type is set
     observation_data["resourceType"] = "Observation"
     
     # If subject is not specified and user has fhir_patient_id, use it
-    if "subject" not in observation_data and current_user.fhir_patient_id:
+    if "subject" not in observation_data and principal.patient_id:
         observation_data["subject"] = {
-            "reference": f"Patient/{current_user.fhir_patient_id}"
+            "reference": f"Patient/{principal.patient_id}"
         }
     
-    return await fhir_client.create_observation(observation_data)
+    result = await fhir_client.create_observation(observation_data)
+    await _invalidate_cache(principal, _subject_patient_id(observation_data))
+    return result
 
 @router.get("/Observation")
 async def get_observations(
+    request: Request,
+    response: Response,
     patient: Optional[str] = Query(None, description="Patient ID to filter observations"),
     category: Optional[str] = Query(None, description="Observation category"),
     code: Optional[str] = Query(None, description="Observation code"),
     date: Optional[str] = Query(None, description="Date range (e.g., ge2023-01-01)"),
-    _count: Optional[int] = Query(None, description="Number of results to return"),
-    current_user: User = Depends(get_current_active_user)
+    _count: Optional[int] = Query(None, gt=0, le=MAX_SEARCH_COUNT, description="Number of results to return"),
+    _sort: Literal["-date", "date"] = Query("-date", description="Sort order (default: latest first)"),
+    principal: Principal = Depends(get_request_principal)
 ):
     """Get Observation resources from FHIR server with optional filtering"""
-    params = {}
-    
     # If patient is not specified and user has fhir_patient_id, use it
-    if not patient and current_user.fhir_patient_id:
-        patient = current_user.fhir_patient_id
+    if not patient and principal.patient_id:
+        patient = principal.patient_id
     
     # Check if user is accessing their own observations
-    if patient and current_user.fhir_patient_id and current_user.fhir_patient_id != patient:
-        if not current_user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to access these observations"
-            )
-    
-    # Build query parameters
-    if patient:
-        params["patient"] = patient
-    if category:
-        params["category"] = category
-    if code:
-        params["code"] = code
-    if date:
-        params["date"] = date
-    if _count:
-        params["_count"] = str(_count)
-    
-    # Sort by date descending (latest first)
-    params["_sort"] = "-date"
-    
-    return await fhir_client.get_observations(**params)
+    _assert_own_or_admin(principal, patient, "access these observations")
+    
+    # Build query parameters, skipping unset filters
+    params = {
+        key: value
+        for key, value in (
+            ("patient", patient),
+            ("category", category),
+            ("code", code),
+            ("date", date),
+            ("_count", str(_count) if _count else None),
+            ("_sort", _sort),
+        )
+        if value
+    }
+    
+    return await _cached_read(request, response, principal, lambda: fhir_client.get_observations(**params))
 
 @router.get("/Observation/{observation_id}")
 async def get_observation(
     observation_id: str,
-    current_user: User = Depends(get_current_active_user)
+    request: Request,
+    response: Response,
+    principal: Principal = Depends(get_request_principal)
 ):
     """Get Observation resource by ID from FHIR server"""
-    observation = await fhir_client.get_observation(observation_id)
-    
-    # Check if user can access this observation (basic permission check)
-    if current_user.fhir_patient_id:
-        subject_ref = observation.get("subject", {}).get("reference", "")
-        expected_ref = f"Patient/{current_user.fhir_patient_id}"
-        
-        if subject_ref != expected_ref and not current_user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to access this observation"
-            )
-    
-    return observation
+    return await _cached_read(
+        request,
+        response,
+        principal,
+        lambda: _read_scoped(principal, "Observation", observation_id, "access this observation")
+    )
 
 # Condition (Symptom) endpoints
 @router.post("/Condition")
 async def create_condition(
     condition_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user)
+    principal: Principal = Depends(get_request_principal)
 ):
     """Create a new Condition (symptom) resource in FHIR server
     
@@ -169,35 +399,24 @@ async def create_condition(
     condition_data["resourceType"] = "Condition"
     
     # If subject is not specified and user has fhir_patient_id, use it
-    if "subject" not in condition_data and current_user.fhir_patient_id:
+    if "subject" not in condition_data and principal.patient_id:
         condition_data["subject"] = {
-            "reference": f"Patient/{current_user.fhir_patient_id}"
-        }
-    
-    # Set default clinical status if not provided
-    if "clinicalStatus" not in condition_data:
-        condition_data["clinicalStatus"] = {
-            "coding": [{
-                "system": "http://terminology.hl7.org/CodeSystem/condition-clinical",
-                "code": "active",
-                "display": "Active"
-            }]
+            "reference": f"Patient/{principal.patient_id}"
         }
     
-    # Set default category if not provided
-    if "category" not in condition_data:
-        condition_data["category"] = [{
-            "coding": [{
-                "system": "http://terminology.hl7.org/CodeSystem/condition-category",
-                "code": "problem-list-item",
-                "display": "Problem List Item"
-            }]
-        }]
+    # Set default clinical status and category if not provided
+    condition_data.setdefault("clinicalStatus", _DEFAULT_CONDITION_CLINICAL_STATUS)
+    condition_data.setdefault("category", _DEFAULT_CONDITION_CATEGORY)
     
-    return await fhir_client.create_resource("Condition", condition_data)
+    result = await fhir_client.create_resource("Condition", condition_data)
+    await _invalidate_cache(principal, _subject_patient_id(condition_data))
+    await _remember_condition_owners(result)
+    return result
 
 @router.get("/Condition")
 async def get_conditions(
+    request: Request,
+    response: Response,
     patient: Optional[str] = Query(None, description="Patient ID to filter conditions"),
     category: Optional[str] = Query(None, description="Condition category"),
     code: Optional[str] = Query(None, description="Condition code (SNOMED)"),
@@ -205,151 +424,224 @@ async def get_conditions(
     severity: Optional[str] = Query(None, description="Condition severity"),
     onset_date: Optional[str] = Query(None, alias="onset-date", description="Onset date range"),
     recorded_date: Optional[str] = Query(None, alias="recorded-date", description="Recorded date range"),
-    _count: Optional[int] = Query(None, description="Number of results to return"),
-    current_user: User = Depends(get_current_active_user)
+    _count: Optional[int] = Query(None, gt=0, le=MAX_SEARCH_COUNT, description="Number of results to return"),
+    _sort: Literal["-recorded-date", "recorded-date"] = Query("-recorded-date", description="Sort order (default: latest first)"),
+    principal: Principal = Depends(get_request_principal)
 ):
     """Get Condition resources from FHIR server with optional filtering"""
-    params = {}
-    
     # If patient is not specified and user has fhir_patient_id, use it
-    if not patient and current_user.fhir_patient_id:
-        patient = current_user.fhir_patient_id
+    if not patient and principal.patient_id:
+        patient = principal.patient_id
     
     # Check if user is accessing their own conditions
-    if patient and current_user.fhir_patient_id and current_user.fhir_patient_id != patient:
-        if not current_user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to access these conditions"
-            )
-    
-    # Build query parameters
-    if patient:
-        params["patient"] = patient
-    if category:
-        params["category"] = category
-    if code:
-        params["code"] = code
-    if clinical_status:
-        params["clinical-status"] = clinical_status
-    if severity:
-        params["severity"] = severity
-    if onset_date:
-        params["onset-date"] = onset_date
-    if recorded_date:
-        params["recorded-date"] = recorded_date
-    if _count:
-        params["_count"] = str(_count)
-    
-    # Sort by recorded date descending (latest first)
-    params["_sort"] = "-recorded-date"
-    
-    return await fhir_client.search_resources("Condition", **params)
+    _assert_own_or_admin(principal, patient, "access these conditions")
+    
+    # Build query parameters, skipping unset filters
+    params = {
+        key: value
+        for key, value in (
+            ("patient", patient),
+            ("category", category),
+            ("code", code),
+            ("clinical-status", clinical_status),
+            ("severity", severity),
+            ("onset-date", onset_date),
+            ("recorded-date", recorded_date),
+            ("_count", str(_count) if _count else None),
+            ("_sort", _sort),
+        )
+        if value
+    }
+    
+    async def fetch() -> Dict[str, Any]:
+        bundle = await fhir_client.search_resources("Condition", **params)
+        await _remember_condition_owners(
+            *(entry["resource"] for entry in bundle.get("entry", []) if entry.get("resource", {}).get("resourceType") == "Condition")
+        )
+        return bundle
+    
+    return await _cached_read(request, response, principal, fetch)
 
 @router.get("/Condition/{condition_id}")
 async def get_condition(
     condition_id: str,
-    current_user: User = Depends(get_current_active_user)
+    request: Request,
+    response: Response,
+    principal: Principal = Depends(get_request_principal)
 ):
     """Get Condition resource by ID from FHIR server"""
-    condition = await fhir_client.get_resource("Condition", condition_id)
-    
-    # Check if user can access this condition (basic permission check)
-    if current_user.fhir_patient_id:
-        subject_ref = condition.get("subject", {}).get("reference", "")
-        expected_ref = f"Patient/{current_user.fhir_patient_id}"
-        
-        if subject_ref != expected_ref and not current_user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to access this condition"
-            )
+    async def fetch() -> Dict[str, Any]:
+        condition = await _read_scoped(principal, "Condition", condition_id, "access this condition")
+        await _remember_condition_owners(condition)
+        return condition
     
-    return condition
+    return await _cached_read(request, response, principal, fetch)
 
 @router.put("/Condition/{condition_id}")
 async def update_condition(
     condition_id: str,
     condition_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user)
+    if_match: Optional[str] = Header(None, alias="If-Match"),
+    principal: Principal = Depends(get_request_principal)
 ):
-    """Update Condition resource in FHIR server"""
-    # First get the existing condition to check permissions
-    existing_condition = await fhir_client.get_resource("Condition", condition_id)
+    """Update Condition resource in FHIR server
+    
+    An If-Match header (e.g. W/"3") is forwarded for optimistic concurrency.
+    """
+    # Only patient-scoped users need the current owner before writing, read
+    # fresh from FHIR; admins take the cached owner for cache invalidation
+    needs_check = bool(principal.patient_id) and not principal.is_admin
+    owner = await _condition_owner(condition_id, authorize=needs_check)
     
     # Check if user can access this condition
-    if current_user.fhir_patient_id:
-        subject_ref = existing_condition.get("subject", {}).get("reference", "")
-        expected_ref = f"Patient/{current_user.fhir_patient_id}"
-        
-        if subject_ref != expected_ref and not current_user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to update this condition"
-            )
+    if needs_check:
+        _assert_own_or_admin(principal, owner, "update this condition")
     
     # Ensure resource type and ID are set
     condition_data["resourceType"] = "Condition"
     condition_data["id"] = condition_id
     
-    return await fhir_client._make_request("PUT", f"Condition/{condition_id}", condition_data)
+    result = await fhir_client._make_request(
+        "PUT",
+        f"Condition/{condition_id}",
+        condition_data,
+        headers={"If-Match": if_match} if if_match else None
+    )
+    await _invalidate_cache(principal, owner, _subject_patient_id(condition_data))
+    await _remember_condition_owners(condition_data)
+    return result
 
 @router.delete("/Condition/{condition_id}")
 async def delete_condition(
     condition_id: str,
-    current_user: User = Depends(get_current_active_user)
+    principal: Principal = Depends(get_request_principal)
 ):
     """Delete Condition resource from FHIR server"""
-    # First get the existing condition to check permissions
-    existing_condition = await fhir_client.get_resource("Condition", condition_id)
+    needs_check = bool(principal.patient_id) and not principal.is_admin
+    owner = await _condition_owner(condition_id, authorize=needs_check)
     
     # Check if user can access this condition
-    if current_user.fhir_patient_id:
-        subject_ref = existing_condition.get("subject", {}).get("reference", "")
-        expected_ref = f"Patient/{current_user.fhir_patient_id}"
-        
-        if subject_ref != expected_ref and not current_user.is_admin:
+    if needs_check:
+        _assert_own_or_admin(principal, owner, "delete this condition")
+    
+    result = await fhir_client._make_request("DELETE", f"Condition/{condition_id}")
+    await _invalidate_cache(principal, owner)
+    await cache_service.delete(_condition_owner_key(condition_id))
+    return result
+
+def _authorize_batch_entry(principal: Principal, entry: FHIRBatchEntry) -> Dict[str, Any]:
+    """Permission-check one $batch entry and turn it into a FHIR Bundle entry"""
+    path, _, query = entry.url.strip("/").partition("?")
+    parts = path.split("/")
+    resource_type = parts[0]
+    
+    if entry.method == "POST":
+        if len(parts) != 1 or entry.resource is None:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions to delete this condition"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"POST entries need a resource type URL and a resource: {entry.url}"
             )
+        resource = dict(entry.resource, resourceType=resource_type)
+        if "subject" not in resource and principal.patient_id:
+            resource["subject"] = {"reference": f"Patient/{principal.patient_id}"}
+        _assert_own_or_admin(principal, _subject_patient_id(resource), f"create {resource_type}")
+        return {"request": {"method": "POST", "url": resource_type}, "resource": resource}
+    
+    if resource_type == "Patient" and len(parts) > 1:
+        _assert_own_or_admin(principal, parts[1], "access this patient record")
+    elif len(parts) == 1 and resource_type in _COMPARTMENT_TYPES:
+        # Searches are pinned to the caller's own patient, as in the search endpoints
+        params = parse_qsl(query, keep_blank_values=True)
+        patient = next((value for key, value in params if key == "patient"), None)
+        if not patient and principal.patient_id:
+            patient = principal.patient_id
+            params.append(("patient", patient))
+        _assert_own_or_admin(principal, patient, f"access these {resource_type} resources")
+        query = urlencode(params)
+    
+    url = f"{path}?{query}" if query else path
+    return {"request": {"method": "GET", "url": url}}
+
+@router.post("/$batch")
+async def batch_fhir_requests(
+    batch: FHIRBatchRequest,
+    principal: Principal = Depends(get_request_principal)
+):
+    """Run several FHIR reads/creates in one upstream round-trip
     
-    return await fhir_client._make_request("DELETE", f"Condition/{condition_id}")
+    Entries are sent as a FHIR batch Bundle; the result is the list of
+    batch-response entries (``response`` and ``resource``) in request order.
+    """
+    entries = [_authorize_batch_entry(principal, entry) for entry in batch.entries]
+    results = await fhir_client.batch(entries)
+    
+    # Reads by ID can only be checked once the resource's subject is known
+    for index, result in enumerate(results):
+        resource = result.get("resource") or {}
+        if "subject" not in resource:
+            continue
+        try:
+            _assert_own_or_admin(principal, _subject_patient_id(resource), "access this resource")
+        except HTTPException:
+            results[index] = {"response": {"status": "403 Forbidden"}}
+    
+    created = [entry["resource"] for entry in entries if "resource" in entry]
+    if created:
+        await _invalidate_cache(principal, *(_subject_patient_id(resource) for resource in created))
+    return results
 
+# Generic routes: routes match in declaration order, so these catch-alls
+# must stay below every resource-specific route or they would shadow them
 @router.get("/{resource_type}")
 async def search_fhir_resources(
     resource_type: str,
     request: Request,
-    current_user: User = Depends(get_current_active_user)
+    response: Response,
+    principal: Principal = Depends(get_request_principal)
 ):
     """Generic search for any FHIR resource type"""
-    # Get all query parameters
-    params = dict(request.query_params)
+    query_params = request.query_params
+    extra_params = {}
     
     # Add patient filter for user's own data if applicable
-    if resource_type in ["Observation", "Condition", "MedicationRequest", "Procedure"]:
-        if "patient" not in params and current_user.fhir_patient_id:
-            params["patient"] = current_user.fhir_patient_id
-    
-    return await fhir_client.search_resources(resource_type, **params)
+    if resource_type in _COMPARTMENT_TYPES:
+        if "patient" not in query_params and principal.patient_id:
+            extra_params["patient"] = principal.patient_id
+    
+    # Forwarded as multi-items so repeated FHIR parameters (code=A&code=B) are kept
+    return await _cached_read(
+        request,
+        response,
+        principal,
+        lambda: fhir_client.search_resources(resource_type, query_params.multi_items(), **extra_params)
+    )
 
 @router.post("/{resource_type}")
 async def create_fhir_resource(
     resource_type: str,
     resource_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user)
+    request: Request
 ):
     """Create any FHIR resource"""
+    # Authenticated by AuthMiddleware; no dependency needed for a pass-through
+    principal: Principal = request.state.principal
+    
     # Ensure resource type is set
     resource_data["resourceType"] = resource_type
     
-    return await fhir_client.create_resource(resource_type, resource_data)
+    result = await fhir_client.create_resource(resource_type, resource_data)
+    await _invalidate_cache(principal, _subject_patient_id(resource_data))
+    return result
 
 @router.get("/{resource_type}/{resource_id}")
 async def get_fhir_resource(
     resource_type: str,
     resource_id: str,
-    current_user: User = Depends(get_current_active_user)
+    request: Request,
+    response: Response
 ):
     """Get any FHIR resource by type and ID"""
-    return await fhir_client.get_resource(resource_type, resource_id)
\ No newline at end of file
+    # Authenticated by AuthMiddleware; no dependency needed for a pass-through
+    principal: Principal = request.state.principal
+    
+    return await _cached_read(request, response, principal, lambda: fhir_client.get_resource(resource_type, resource_id))
\ No newline at end of file
@@ -2,25 +2,30 @@
 Fitbit OAuth integration endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse
 import pytz
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import httpx
-import secrets
 import base64
-from typing import Optional
-from urllib.parse import urlencode
+import os
+import threading
+from typing import Optional, Tuple
+from urllib.parse import quote, urlencode
 
 from app.database import get_db
-from app.auth.auth import get_current_user
+from app.auth.auth import decode_token_async, encode_token_async, get_current_user
 from app.models.user import User
 from app.config import settings
 from app.schemas.vendor import OAuthTokenResponse
 from app.services.vendor_integration_service import vendor_integration_service
 from app.models.vendor_integration import VendorIntegration
+from app.services.fitbit_service import fitbit_service
+from app.services.oauth_state_store import oauth_state_store
 from app.services.oauth_token_service import oauth_token_service
+from app.services.user_service import user_service
 import logging
-from jose import jwt, JWTError
+from jose import JWTError
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -30,19 +35,57 @@ router = APIRouter(
     tags=["fitbit"]
 )
 
-# Store state tokens temporarily (in production, use Redis or database)
-# This is a simple in-memory store for demo purposes
-oauth_states = {}
+# Everything in the authorize URL except the per-request state, encoded once
+_AUTHORIZE_URL_PREFIX = f"{settings.fitbit_oauth_url}?" + urlencode({
+    "response_type": "code",
+    "client_id": settings.fitbit_client_id,
+    "redirect_uri": settings.fitbit_redirect_uri,
+    "scope": "activity heartrate oxygen_saturation weight profile sleep respiratory_rate",
+})
 
 
-def _resolve_user_from_request(
+def _authorize_url(state: str) -> str:
+    """Fitbit authorization URL carrying the given state token"""
+    return f"{_AUTHORIZE_URL_PREFIX}&state={quote(state, safe='')}"
+
+
+# State nonces are sliced from a pooled os.urandom read (one syscall per
+# ~450 nonces); 9 random bytes encode to the same 12 chars as token_urlsafe(12)
+_NONCE_BYTES = 9
+_NONCE_POOL_SIZE = _NONCE_BYTES * 455
+_nonce_pool = b""
+_nonce_offset = 0
+_nonce_lock = threading.Lock()
+
+
+def _reset_nonce_pool() -> None:
+    """Drop pooled entropy so forked workers never share nonces"""
+    global _nonce_pool, _nonce_offset
+    _nonce_pool, _nonce_offset = b"", 0
+
+
+os.register_at_fork(after_in_child=_reset_nonce_pool)
+
+
+def _state_nonce() -> str:
+    """URL-safe random nonce for a signed OAuth state"""
+    global _nonce_pool, _nonce_offset
+    with _nonce_lock:
+        if _nonce_offset + _NONCE_BYTES > len(_nonce_pool):
+            _nonce_pool, _nonce_offset = os.urandom(_NONCE_POOL_SIZE), 0
+        chunk = _nonce_pool[_nonce_offset:_nonce_offset + _NONCE_BYTES]
+        _nonce_offset += _NONCE_BYTES
+    return base64.urlsafe_b64encode(chunk).decode("ascii")
+
+
+async def _resolve_user_from_request(
     request: Request,
     db: Session,
     token_query: Optional[str] = None
-) -> User:
+) -> Tuple[int, str]:
     """
     Resolve authenticated user from either Bearer header or token query parameter.
-    Raises HTTP 403 if neither is provided or invalid.
+    Returns (user_id, email); raises HTTP 403 if neither is provided or invalid.
     """
     # Try Authorization header first
     auth_header = request.headers.get("Authorization")
@@ -56,20 +99,20 @@ def _resolve_user_from_request(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Authorization required")
 
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = await decode_token_async(token)
         email: str = payload.get("sub")
         if not email:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token: missing subject")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
+    user_id = user_service.get_user_id_by_email(db, email)
+    if user_id is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User not found")
-    return user
+    return user_id, email
 
 
-def _generate_signed_state(email: str, integration_id: int) -> str:
+async def _generate_signed_state(email: str, integration_id: int) -> str:
     """Generate a short-lived signed state JWT embedding the user identity."""
     jakarta_tz = pytz.timezone('UTC')
     claims = {
@@ -77,26 +120,23 @@ def _generate_signed_state(email: str, integration_id: int) -> str:
         "integration_id": integration_id,
         "iat": datetime.now(jakarta_tz),
         "exp": datetime.now(jakarta_tz) + timedelta(minutes=5),
-        "nonce": secrets.token_urlsafe(12),
+        "nonce": _state_nonce(),
     }
-    return jwt.encode(claims, settings.secret_key, algorithm=settings.algorithm)
+    return await encode_token_async(claims)
 
 
-def _validate_signed_state(state_token: str, db: Session) -> Optional[tuple]:
+async def _validate_signed_state(state_token: str) -> Optional[Tuple[str, int]]:
     """
-    Validate signed state and return (user_id, integration_id) if valid.
+    Validate signed state and return (email, integration_id) if valid.
     Returns None if invalid.
     """
     try:
-        claims = jwt.decode(state_token, settings.secret_key, algorithms=[settings.algorithm])
+        claims = await decode_token_async(state_token)
         email = claims.get("sub")
         integration_id = claims.get("integration_id")
         if not email or not integration_id:
             return None
-        user = db.query(User).filter(User.email == email).first()
-        if not user:
-            return None
-        return (user.id, int(integration_id))
+        return (email, int(integration_id))
     except JWTError:
         return None
 
@@ -121,7 +161,7 @@ async def fitbit_authorize(
         Redirect to Fitbit OAuth page
     """
     # Resolve current user from header or query token
-    current_user = _resolve_user_from_request(request, db, token_query=token)
+    user_id, email = await _resolve_user_from_request(request, db, token_query=token)
 
     # Verify Fitbit credentials are configured
     if not settings.fitbit_client_id or not settings.fitbit_client_secret:
@@ -133,7 +173,7 @@ async def fitbit_authorize(
     # Check if user has selected Fitbit vendor
     integration = vendor_integration_service.get_integration(
         db=db,
-        user_id=current_user.id,
+        user_id=user_id,
         vendor="fitbit"
     )
     
@@ -144,25 +184,14 @@ async def fitbit_authorize(
         )
     
     # Generate signed, short-lived state containing user identity
-    state = _generate_signed_state(current_user.email, integration.id)
-    # Also keep a transient mapping to support multi-process scenarios
-    oauth_states[state] = {"user_id": current_user.id, "integration_id": integration.id}
-    
-    # Build authorization URL
-    params = {
-        "response_type": "code",
-        "client_id": settings.fitbit_client_id,
-        "redirect_uri": settings.fitbit_redirect_uri,
-        "scope": "activity heartrate oxygen_saturation weight profile sleep respiratory_rate",
-        "state": state
-    }
+    state = await _generate_signed_state(email, integration.id)
+    # Also keep a transient mapping (shared via Redis when configured)
+    await oauth_state_store.put(state, {"user_id": user_id, "integration_id": integration.id})
     
-    auth_url = f"{settings.fitbit_oauth_url}?{urlencode(params)}"
-    
-    return RedirectResponse(url=auth_url)
+    return RedirectResponse(url=_authorize_url(state))
 
 
-@router.get("/authorize/url")
+@router.get("/authorize/url", response_class=ORJSONResponse)
 async def fitbit_authorize_url(
     request: Request,
     token: Optional[str] = Query(None, description="JWT token when no Authorization header is available"),
@@ -172,11 +201,11 @@ async def fitbit_authorize_url(
     Return the Fitbit OAuth authorization URL embedding a signed state token.
     Useful for clients that need the URL instead of a redirect.
     """
-    current_user = _resolve_user_from_request(request, db, token_query=token)
+    user_id, email = await _resolve_user_from_request(request, db, token_query=token)
 
     integration = vendor_integration_service.get_integration(
         db=db,
-        user_id=current_user.id,
+        user_id=user_id,
         vendor="fitbit"
     )
     if not integration:
@@ -185,18 +214,11 @@ async def fitbit_authorize_url(
             detail="Please select Fitbit vendor first using POST /integrations/vendors/select"
         )
 
-    state = _generate_signed_state(current_user.email, integration.id)
-    oauth_states[state] = {"user_id": current_user.id, "integration_id": integration.id}
+    state = await _generate_signed_state(email, integration.id)
+    await oauth_state_store.put(state, {"user_id": user_id, "integration_id": integration.id})
 
-    params = {
-        "response_type": "code",
-        "client_id": settings.fitbit_client_id,
-        "redirect_uri": settings.fitbit_redirect_uri,
-        "scope": "activity heartrate oxygen_saturation weight profile sleep respiratory_rate",
-        "state": state
-    }
-    auth_url = f"{settings.fitbit_oauth_url}?{urlencode(params)}"
-    return {"url": auth_url}
+    # Returned directly so FastAPI skips response encoding for this fixed shape
+    return ORJSONResponse({"url": _authorize_url(state)})
 
 
 @router.get("/callback")
@@ -219,68 +241,63 @@ async def fitbit_callback(
     Returns:
         Success message with token information
     """
-    # Verify state token (prefer signed state, fallback to transient store)
-    validated = _validate_signed_state(state, db)
-    if validated:
-        user_id, integration_id = validated
-        # Remove transient mapping if present
-        if state in oauth_states:
-            oauth_states.pop(state, None)
+    # Verify state token: the transient store is authoritative when it has the
+    # state (and popping it prevents reuse); otherwise verify the signed state
+    oauth_data = await oauth_state_store.pop(state)
+    if oauth_data is not None:
+        # Verify integration belongs to the stored user
+        integration = db.query(VendorIntegration).filter(
+            VendorIntegration.id == oauth_data["integration_id"],
+            VendorIntegration.user_id == oauth_data["user_id"],
+            VendorIntegration.vendor == "fitbit"
+        ).first()
     else:
-        if state not in oauth_states:
+        validated = await _validate_signed_state(state)
+        if not validated:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid or expired state token"
             )
-        oauth_data = oauth_states.pop(state)
-        user_id = oauth_data["user_id"]
-        integration_id = oauth_data["integration_id"]
-    
-    # Verify integration belongs to the resolved user
-    integration = db.query(VendorIntegration).filter(
-        VendorIntegration.id == integration_id,
-        VendorIntegration.user_id == user_id,
-        VendorIntegration.vendor == "fitbit"
-    ).first()
+        email, integration_id = validated
+        # Resolve the user and verify the integration belongs to them in one query
+        integration = db.execute(
+            select(VendorIntegration)
+            .join(User, User.id == VendorIntegration.user_id)
+            .where(
+                User.email == email,
+                VendorIntegration.id == integration_id,
+                VendorIntegration.vendor == "fitbit"
+            )
+        ).scalar_one_or_none()
     if not integration:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Integration not found for user"
         )
+    user_id, integration_id = integration.user_id, integration.id
 
     # Exchange code for tokens
     try:
-        # Prepare Basic Auth header
-        credentials = f"{settings.fitbit_client_id}:{settings.fitbit_client_secret}"
-        encoded_credentials = base64.b64encode(credentials.encode()).decode()
-        
-        headers = {
-            "Authorization": f"Basic {encoded_credentials}",
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        
         data = {
             "code": code,
             "grant_type": "authorization_code",
             "redirect_uri": settings.fitbit_redirect_uri
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.fitbit_token_url,
-                headers=headers,
-                data=data,
-                timeout=30.0
+        response = await fitbit_service.client.post(
+            settings.fitbit_token_url,
+            headers=fitbit_service.token_headers,
+            data=data
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Fitbit token exchange failed: {response.text}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to exchange code for tokens: {response.text}"
             )
-            
-            if response.status_code != 200:
-                logger.error(f"Fitbit token exchange failed: {response.text}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Failed to exchange code for tokens: {response.text}"
-                )
-            
-            token_data = response.json()
+        
+        token_data = response.json()
         
         # Store tokens
         oauth_token_service.store_tokens(
@@ -4,13 +4,16 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import Optional
 import httpx
+import orjson
 from datetime import date
 
+from app.config import settings
 from app.database import get_db
 from app.auth.auth import get_current_user
 from app.models.user import User
-from app.config import settings
-from app.schemas.vendor import HealthObservationsResponse, HealthObservation
+from app.fhir.client import fhir_client
+from app.schemas.vendor import HealthObservationsResponse
+from app.services.observation_query import LOINC_PARAM, OBSERVATION_ELEMENTS, to_health_observation
 from app.services.sync_job_service import sync_job_service
 from app.services.vendor_integration_service import vendor_integration_service
 import logging
@@ -58,83 +61,46 @@ async def get_health_observations(
             detail="User does not have a FHIR patient record"
         )
     
-    # Build FHIR search parameters
-    params = {
-        "patient": current_user.fhir_patient_id,
-        "_count": page_size,
-        "_offset": (page - 1) * page_size,
-        "_sort": "-date"  # Sort by date descending
-    }
+    # Build FHIR search parameters (a list, so "date" can repeat for a range)
+    params = [
+        ("patient", current_user.fhir_patient_id),
+        ("_count", page_size),
+        ("_offset", (page - 1) * page_size),
+        ("_sort", "-date"),  # Sort by date descending
+        ("_elements", OBSERVATION_ELEMENTS)
+    ]
     
     # Add date filters if provided
     if date_from:
-        params["date"] = f"ge{date_from}"
+        params.append(("date", f"ge{date_from}"))
     if date_to:
-        date_param = params.get("date", "")
-        if date_param:
-            params["date"] = f"{date_param}&date=le{date_to}"
-        else:
-            params["date"] = f"le{date_to}"
+        params.append(("date", f"le{date_to}"))
     
-    # Add code filter if observation type provided
-    if observation_type:
-        # Map common types to LOINC codes
-        type_to_loinc = {
-            "heart_rate": "8867-4",
-            "spo2": "59408-5",
-            "body_weight": "29463-7",
-            "steps": "41950-7",
-            "calories": "41981-2",
-            "distance": "41953-1"
-        }
-        
-        if observation_type in type_to_loinc:
-            params["code"] = f"http://loinc.org|{type_to_loinc[observation_type]}"
+    # Add code filter if a known observation type was provided
+    code = LOINC_PARAM.get(observation_type)
+    if code:
+        params.append(("code", code))
     
     try:
-        # Query FHIR server
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.fhir_base_url}/Observation",
-                params=params,
-                timeout=30.0
+        # Query FHIR server over the shared connection pool
+        response = await fhir_client.client.get("Observation", params=params)
+        
+        if response.status_code != 200:
+            logger.error(f"FHIR query failed: {response.status_code} - {response.text}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to retrieve health observations from FHIR server"
             )
-            
-            if response.status_code != 200:
-                logger.error(f"FHIR query failed: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to retrieve health observations from FHIR server"
-                )
-            
-            bundle = response.json()
         
-        # Parse FHIR Bundle
-        observations = []
-        entries = bundle.get("entry", [])
+        bundle = orjson.loads(response.content)
         
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") == "Observation":
-                try:
-                    # Extract observation data
-                    code_coding = resource.get("code", {}).get("coding", [{}])[0]
-                    value_quantity = resource.get("valueQuantity", {})
-                    
-                    obs = HealthObservation(
-                        id=resource.get("id", ""),
-                        code=code_coding.get("code", ""),
-                        code_system=code_coding.get("system", ""),
-                        display=code_coding.get("display", ""),
-                        value=value_quantity.get("value", 0),
-                        unit=value_quantity.get("unit", ""),
-                        effective_datetime=resource.get("effectiveDateTime", ""),
-                        patient_id=current_user.fhir_patient_id
-                    )
-                    observations.append(obs)
-                except Exception as e:
-                    logger.warning(f"Failed to parse observation: {str(e)}")
-                    continue
+        # Parse FHIR Bundle
+        patient_id = current_user.fhir_patient_id
+        observations = [
+            obs
+            for entry in bundle.get("entry", ())
+            if (obs := to_health_observation(entry.get("resource", {}), patient_id)) is not None
+        ]
         
         # Get total count
         total = bundle.get("total", len(observations))
@@ -162,6 +128,19 @@ async def get_health_observations(
         )
 
 
+def _parse_sync_date(date_str: Optional[str]) -> date:
+    """Parse the optional sync date (YYYY-MM-DD), defaulting to today"""
+    if not date_str:
+        return date.today()
+    try:
+        return date.fromisoformat(date_str)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use YYYY-MM-DD"
+        )
+
+
 @router.post("/sync")
 async def sync_health_data(
     date_str: Optional[str] = Query(None, description="Date to sync (YYYY-MM-DD), defaults to today"),
@@ -183,28 +162,25 @@ async def sync_health_data(
     Returns:
         Sync initiated message
     """
-    # Validate date format if provided
-    if date_str:
-        try:
-            date.fromisoformat(date_str)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid date format. Use YYYY-MM-DD"
-            )
+    # Validate once at the edge and keep the parsed date
+    sync_date = _parse_sync_date(date_str)
     
     # Architecture rule: do not pull vendor APIs inline.
     # Enqueue vendor sync jobs and return immediately.
-    integrations = vendor_integration_service.get_user_integrations(db=db, user_id=current_user.id, active_only=True)
-    job_ids = []
-    for integ in integrations:
-        job = sync_job_service.enqueue(db, user_id=current_user.id, vendor=integ.vendor, trigger="manual")
-        job_ids.append({"vendor": integ.vendor, "sync_job_id": job.id})
+    vendors = vendor_integration_service.get_active_vendors(db=db, user_id=current_user.id)
+    jobs = sync_job_service.enqueue_many(
+        db,
+        user_id=current_user.id,
+        vendors=vendors,
+        stale_after_seconds=settings.sync_job_stale_after_seconds,
+        trigger="manual",
+    )
+    job_ids = [{"vendor": vendor, "sync_job_id": job_id} for vendor, job_id in jobs]
 
     return {
         "message": "Health data sync enqueued",
         "user_id": current_user.id,
-        "date": date_str or date.today().isoformat(),
+        "date": sync_date.isoformat(),
         "jobs": job_ids,
     }
 
@@ -229,26 +205,23 @@ async def sync_health_data_immediate(
     Returns:
         Sync results
     """
-    # Validate date format if provided
-    if date_str:
-        try:
-            date.fromisoformat(date_str)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid date format. Use YYYY-MM-DD"
-            )
+    # Validate once at the edge and keep the parsed date
+    sync_date = _parse_sync_date(date_str)
     
     # Kept for backward compatibility, but now behaves like an enqueue-only signal.
-    integrations = vendor_integration_service.get_user_integrations(db=db, user_id=current_user.id, active_only=True)
-    job_ids = []
-    for integ in integrations:
-        job = sync_job_service.enqueue(db, user_id=current_user.id, vendor=integ.vendor, trigger="manual")
-        job_ids.append({"vendor": integ.vendor, "sync_job_id": job.id})
+    vendors = vendor_integration_service.get_active_vendors(db=db, user_id=current_user.id)
+    jobs = sync_job_service.enqueue_many(
+        db,
+        user_id=current_user.id,
+        vendors=vendors,
+        stale_after_seconds=settings.sync_job_stale_after_seconds,
+        trigger="manual",
+    )
+    job_ids = [{"vendor": vendor, "sync_job_id": job_id} for vendor, job_id in jobs]
 
     return {
         "message": "Health data sync enqueued",
         "user_id": current_user.id,
-        "date": date_str or date.today().isoformat(),
+        "date": sync_date.isoformat(),
         "jobs": job_ids,
     }
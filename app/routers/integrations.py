@@ -1,7 +1,16 @@
 """
 API endpoints for vendor integrations
+
+These handlers only do synchronous SQLAlchemy work, so they are plain ``def``
+functions: FastAPI runs them in its threadpool instead of blocking the event
+loop for every database round-trip.
 """
+from datetime import tzinfo
+from functools import lru_cache
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from pydantic import TypeAdapter
+import pytz
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -25,9 +34,23 @@ router = APIRouter(
     tags=["integrations"]
 )
 
+_UTC = pytz.UTC
+
+# Validates a whole list of rows in one pydantic-core call
+_INFO_ADAPTER = TypeAdapter(List[VendorIntegrationInfo])
+
+
+@lru_cache(maxsize=512)
+def _get_tz(name: str) -> tzinfo:
+    """Resolve a timezone name once per process, falling back to UTC if invalid"""
+    try:
+        return pytz.timezone(name)
+    except Exception:
+        return _UTC
+
 
 @router.post("/vendors/select", response_model=VendorSelectionResponse)
-async def select_vendor(
+def select_vendor(
     request: VendorSelectionRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -46,17 +69,18 @@ async def select_vendor(
     Returns:
         VendorSelectionResponse with integration details
     """
+    vendor = request.vendor.value
     try:
         # Create or reactivate the integration
         integration = vendor_integration_service.create_integration(
             db=db,
             user_id=current_user.id,
-            vendor=request.vendor.value
+            vendor=vendor
         )
         
         return VendorSelectionResponse(
-            message=f"Successfully selected {request.vendor.value} integration",
-            vendor=request.vendor.value,
+            message=f"Successfully selected {vendor} integration",
+            vendor=vendor,
             integration_id=integration.id
         )
     
@@ -68,7 +92,7 @@ async def select_vendor(
 
 
 @router.post("/vendors/disconnect", response_model=VendorDisconnectResponse)
-async def disconnect_vendor(
+def disconnect_vendor(
     request: VendorDisconnectRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -87,46 +111,35 @@ async def disconnect_vendor(
     Returns:
         VendorDisconnectResponse with disconnection confirmation
     """
-    # Check if integration exists
-    integration = vendor_integration_service.get_integration(
+    vendor = request.vendor.value
+    
+    # Deactivate and drop tokens in one conditional UPDATE (no read-then-write)
+    result = vendor_integration_service.disconnect_atomic(
         db=db,
         user_id=current_user.id,
-        vendor=request.vendor.value
+        vendor=vendor
     )
     
-    if not integration:
+    if result == "missing":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No {request.vendor.value} integration found for this user"
+            detail=f"No {vendor} integration found for this user"
         )
     
-    if not integration.is_active:
+    if result == "already_off":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"{request.vendor.value} integration is already disconnected"
-        )
-    
-    # Disconnect the integration
-    success = vendor_integration_service.disconnect_integration(
-        db=db,
-        user_id=current_user.id,
-        vendor=request.vendor.value
-    )
-    
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to disconnect {request.vendor.value} integration"
+            detail=f"{vendor} integration is already disconnected"
         )
     
     return VendorDisconnectResponse(
-        message=f"Successfully disconnected {request.vendor.value} integration",
-        vendor=request.vendor.value
+        message=f"Successfully disconnected {vendor} integration",
+        vendor=vendor
     )
 
 
 @router.get("/vendors", response_model=VendorIntegrationListResponse)
-async def list_vendor_integrations(
+def list_vendor_integrations(
     active_only: bool = Query(True, description="Only return active integrations"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -142,31 +155,23 @@ async def list_vendor_integrations(
     Returns:
         VendorIntegrationListResponse with list of integrations
     """
-    integrations = vendor_integration_service.get_user_integrations(
+    integrations = vendor_integration_service.get_user_integration_summaries(
         db=db,
         user_id=current_user.id,
         active_only=active_only
     )
 
     # Convert last_sync_at from UTC to the user's timezone before returning
-    user_tz_name = current_user.timezone or "UTC"
-    try:
-        import pytz
-        user_tz = pytz.timezone(user_tz_name)
-    except Exception:
-        # Fallback safely to UTC if timezone is invalid
-        import pytz
-        user_tz = pytz.timezone("UTC")
+    user_tz = _get_tz(current_user.timezone or "UTC")
 
-    integration_infos = []
+    rows = []
     for integration in integrations:
         last_sync_at_local = None
         if integration.last_sync_at is not None:
             # Ensure the datetime is timezone-aware in UTC, then convert
             try:
                 if integration.last_sync_at.tzinfo is None:
-                    import pytz
-                    last_sync_at_utc = pytz.UTC.localize(integration.last_sync_at)
+                    last_sync_at_utc = _UTC.localize(integration.last_sync_at)
                 else:
                     last_sync_at_utc = integration.last_sync_at
                 last_sync_at_local = last_sync_at_utc.astimezone(user_tz)
@@ -174,21 +179,19 @@ async def list_vendor_integrations(
                 # If conversion fails, leave as original value
                 last_sync_at_local = integration.last_sync_at
 
-        integration_infos.append(
-            VendorIntegrationInfo(
-                id=integration.id,
-                vendor=integration.vendor,
-                is_active=integration.is_active,
-                last_sync_at=last_sync_at_local,
-                created_at=integration.created_at,
-            )
-        )
+        rows.append({
+            "id": integration.id,
+            "vendor": integration.vendor,
+            "is_active": integration.is_active,
+            "last_sync_at": last_sync_at_local,
+            "created_at": integration.created_at,
+        })
 
-    return VendorIntegrationListResponse(integrations=integration_infos)
+    return VendorIntegrationListResponse.model_construct(integrations=_INFO_ADAPTER.validate_python(rows))
 
 
 @router.delete("/vendors/{integration_id}")
-async def deactivate_vendor_integration(
+def deactivate_vendor_integration(
     integration_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -8,24 +8,34 @@ This router enforces the architecture rule:
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import Optional
+import base64
+import binascii
+import hashlib
+from typing import List, Optional, Tuple
 import httpx
+import orjson
 
 from app.auth.auth import get_current_user
+from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.models.vendor_integration import VendorIntegration
-from app.config import settings
-from app.schemas.vendor import HealthObservationsResponse, HealthObservation
+from app.fhir.client import fhir_client
+from app.schemas.vendor import HealthObservationsResponse
 from app.schemas.sync import SyncEnqueueResponse, SyncStatusResponse, VendorSyncStatus
+from app.services.cache_service import cache_service
+from app.services.observation_query import LOINC_PARAM, OBSERVATION_ELEMENTS, to_health_observation
 from app.services.sync_job_service import sync_job_service
 
 router = APIRouter(tags=["sync"])
 
 
+# DB-only handlers are plain def so FastAPI runs them in its threadpool and the
+# blocking SQLAlchemy calls do not stall the event loop
 @router.post("/vendors/{vendor}/sync", status_code=status.HTTP_202_ACCEPTED, response_model=SyncEnqueueResponse)
-async def enqueue_vendor_sync(
+def enqueue_vendor_sync(
     vendor: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -47,47 +57,54 @@ async def enqueue_vendor_sync(
             detail="No active vendor integration found",
         )
 
-    # Enqueue a job and return immediately.
-    job = sync_job_service.enqueue(db, user_id=current_user.id, vendor=vendor_key, trigger="manual")
+    # Enqueue a job and return immediately; repeat requests while a job is
+    # queued/running get that job back instead of a duplicate.
+    job_id, sync_status, _ = sync_job_service.enqueue_debounced(
+        db,
+        user_id=current_user.id,
+        vendor=vendor_key,
+        stale_after_seconds=settings.sync_job_stale_after_seconds,
+        trigger="manual",
+    )
 
-    return SyncEnqueueResponse(vendor=vendor_key, sync_job_id=job.id, sync_status="queued")
+    return SyncEnqueueResponse(vendor=vendor_key, sync_job_id=job_id, sync_status=sync_status)
 
 
 @router.get("/sync/status", response_model=SyncStatusResponse)
-async def get_sync_status(
+def get_sync_status(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     vendor: Optional[str] = None,
 ):
-    q = db.query(VendorIntegration).filter(VendorIntegration.user_id == current_user.id)
-    if vendor:
-        q = q.filter(VendorIntegration.vendor == vendor.lower().strip())
-
-    integrations = q.all()
-    vendors = []
-    for integ in integrations:
-        latest = sync_job_service.get_latest_job(db, user_id=current_user.id, vendor=integ.vendor)
-        vendors.append(
-            VendorSyncStatus(
-                vendor=integ.vendor,
-                vendor_user_id=integ.vendor_user_id,
-                last_successful_sync_at=integ.last_successful_sync_at,
-                sync_status=integ.sync_status,
-                sync_job_id=integ.sync_job_id,
-                last_job_status=(latest.status if latest else None),
-                last_job_error=(latest.last_error if latest else None),
-                last_job_started_at=(latest.started_at if latest else None),
-                last_job_finished_at=(latest.finished_at if latest else None),
-            )
-        )
+    rows = sync_job_service.get_integrations_with_latest_job(db, user_id=current_user.id, vendor=vendor)
+    # Rows are already labelled with the schema's field names and typed by the DB
+    vendors = [VendorSyncStatus.model_construct(**row._mapping) for row in rows]
 
-    return SyncStatusResponse(user_id=current_user.id, vendors=vendors)
+    return SyncStatusResponse.model_construct(user_id=current_user.id, vendors=vendors)
+
+
+def _encode_cursor(effective: str, ids: List[str]) -> str:
+    """Opaque cursor: the last page's oldest timestamp and the ids seen at it."""
+    return base64.urlsafe_b64encode(orjson.dumps({"t": effective, "ids": ids})).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, List[str]]:
+    """Inverse of _encode_cursor; a malformed cursor is a 400."""
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(data["t"]), [str(i) for i in data["ids"]]
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
 
 
 @router.get("/observations", response_model=HealthObservationsResponse)
 async def get_observations(
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
     observation_type: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
@@ -97,6 +114,14 @@ async def get_observations(
     """Read-only observations endpoint for Flutter.
 
     This intentionally does not trigger vendor ingestion.
+
+    Pass the returned next_cursor as cursor to fetch the following page:
+    the search resumes at the last timestamp seen (date=le...) instead of
+    making the FHIR server skip page * page_size rows. page/_offset paging is
+    deprecated and only used when no cursor is given.
+
+    Pages are cached per patient for FHIR_CACHE_TTL_SECONDS; FHIR writes and
+    finished sync jobs invalidate them through the patient's cache tag.
     """
 
     if not current_user.fhir_patient_id:
@@ -105,81 +130,90 @@ async def get_observations(
             detail="User does not have a FHIR patient record",
         )
 
-    params = {
-        "patient": current_user.fhir_patient_id,
-        "_count": page_size,
-        "_offset": (page - 1) * page_size,
-        "_sort": "-date",
-    }
+    params = [
+        ("patient", current_user.fhir_patient_id),
+        ("_sort", "-date"),
+        ("_elements", OBSERVATION_ELEMENTS),
+    ]
+
+    last_effective: Optional[str] = None
+    seen_ids: List[str] = []
+    if cursor:
+        # Observations sharing the boundary timestamp may straddle pages, so
+        # re-include it and drop the ones already returned
+        last_effective, seen_ids = _decode_cursor(cursor)
+        params.append(("date", f"le{last_effective}"))
+        params.append(("_count", page_size + len(seen_ids)))
+    else:
+        params.append(("_count", page_size))
+        params.append(("_offset", (page - 1) * page_size))
 
     if date_from:
-        params["date"] = f"ge{date_from}"
+        params.append(("date", f"ge{date_from}"))
     if date_to:
-        date_param = params.get("date", "")
-        if date_param:
-            params["date"] = f"{date_param}&date=le{date_to}"
-        else:
-            params["date"] = f"le{date_to}"
-
-    if observation_type:
-        type_to_loinc = {
-            "heart_rate": "8867-4",
-            "spo2": "59408-5",
-            "body_weight": "29463-7",
-            "steps": "41950-7",
-            "calories": "41981-2",
-            "distance": "41953-1",
-        }
-        if observation_type in type_to_loinc:
-            params["code"] = f"http://loinc.org|{type_to_loinc[observation_type]}"
+        params.append(("date", f"le{date_to}"))
+
+    code = LOINC_PARAM.get(observation_type)
+    if code:
+        params.append(("code", code))
+
+    patient_id = current_user.fhir_patient_id
+    digest = hashlib.blake2b(orjson.dumps([page, params]), digest_size=16).hexdigest()
+    cache_key = f"observations:{patient_id}:{digest}"
+    cached = await cache_service.get_json(cache_key)
+    if cached is not None:
+        # Stored already validated and JSON-encoded; skip the response model
+        return ORJSONResponse(cached)
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.fhir_base_url}/Observation",
-                params=params,
-                timeout=30.0,
+        response = await fhir_client.client.get("Observation", params=params)
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to retrieve health observations from FHIR server",
             )
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to retrieve health observations from FHIR server",
-                )
-            bundle = response.json()
-
-        observations = []
-        entries = bundle.get("entry", [])
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Observation":
-                continue
-            try:
-                code_coding = resource.get("code", {}).get("coding", [{}])[0]
-                value_quantity = resource.get("valueQuantity", {})
-                observations.append(
-                    HealthObservation(
-                        id=resource.get("id", ""),
-                        code=code_coding.get("code", ""),
-                        code_system=code_coding.get("system", ""),
-                        display=code_coding.get("display", ""),
-                        value=value_quantity.get("value", 0),
-                        unit=value_quantity.get("unit", ""),
-                        effective_datetime=resource.get("effectiveDateTime", ""),
-                        patient_id=current_user.fhir_patient_id,
-                    )
-                )
-            except Exception:
-                continue
+        bundle = orjson.loads(response.content)
+
+        skip = set(seen_ids)
+        entries = [
+            entry
+            for entry in bundle.get("entry", ())
+            if entry.get("resource", {}).get("id") not in skip
+        ][:page_size]
+        observations = [
+            obs
+            for entry in entries
+            if (obs := to_health_observation(entry.get("resource", {}), patient_id)) is not None
+        ]
+
+        next_cursor = None
+        if len(entries) == page_size and observations:
+            boundary = observations[-1].effective_datetime
+            boundary_ids = [obs.id for obs in observations if obs.effective_datetime == boundary]
+            if last_effective == boundary.isoformat():
+                # The whole page sat on the previous boundary; keep excluding those too
+                boundary_ids = seen_ids + boundary_ids
+            next_cursor = _encode_cursor(boundary.isoformat(), boundary_ids)
 
         total = bundle.get("total", len(observations))
-        has_more = total > (page * page_size)
-        return HealthObservationsResponse(
+        has_more = next_cursor is not None if cursor else total > (page * page_size)
+        result = HealthObservationsResponse(
             observations=observations,
             total=total,
             page=page,
             page_size=page_size,
             has_more=has_more,
+            next_cursor=next_cursor,
+        )
+        await cache_service.set_json(
+            cache_key,
+            result.model_dump(mode="json"),
+            settings.fhir_cache_ttl_seconds,
+            # Own tag: set_json refreshes a tag's expiry to the caller's TTL, and
+            # the FHIR reads under patient:{id} live far longer than these pages
+            tags=[f"observations:{patient_id}"],
         )
+        return result
 
     except httpx.HTTPError as e:
         raise HTTPException(
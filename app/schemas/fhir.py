@@ -1,6 +1,6 @@
 from enum import Enum
-from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
 
 class FHIRResource(BaseModel):
     resourceType: str
@@ -52,4 +52,12 @@ class FHIRCondition(FHIRResource):
 class FHIRResponse(BaseModel):
     resourceType: str
     id: str
-    meta: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    meta: Optional[Dict[str, Any]] = None
+
+class FHIRBatchEntry(BaseModel):
+    method: Literal["GET", "POST"]
+    url: str  # Relative FHIR URL, e.g. "Patient/123" or "Observation?code=8867-4"
+    resource: Optional[Dict[str, Any]] = None  # Body for POST entries
+
+class FHIRBatchRequest(BaseModel):
+    entries: List[FHIRBatchEntry] = Field(..., min_length=1, max_length=50)
@@ -101,6 +101,7 @@ class HealthObservationsResponse(BaseModel):
     page: int
     page_size: int
     has_more: bool
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
     
     class Config:
         from_attributes = True
@@ -0,0 +1,202 @@
+"""
+Redis-backed cache shared by all API workers
+
+Caching is optional: with REDIS_URL unset every lookup is a miss and every
+write is a no-op. Redis errors are logged and treated the same way, so an
+unavailable cache never fails a request.
+"""
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheService:
+    """
+    JSON cache with tag-based invalidation
+
+    Each cached key can be recorded under one or more tags (Redis sets), so a
+    write can drop every key derived from, e.g., one patient's data at once.
+    """
+
+    KEY_PREFIX = "phr:"
+
+    def __init__(self):
+        self.url = settings.redis_url
+        self._client: Optional[redis.Redis] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a Redis URL is configured"""
+        return bool(self.url)
+
+    async def startup(self) -> None:
+        """Open the Redis connection pool (called from the app lifespan)"""
+        if self.enabled and self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+
+    async def aclose(self) -> None:
+        """Close the Redis connection pool (called from the app lifespan)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> Optional[redis.Redis]:
+        """Shared Redis client, opened lazily; None when caching is disabled"""
+        if self.enabled and self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def _key(self, key: str) -> str:
+        return f"{self.KEY_PREFIX}{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.KEY_PREFIX}tag:{tag}"
+
+    async def get_json(self, key: str) -> Optional[Any]:
+        """
+        Read a cached JSON value
+
+        Args:
+            key: Cache key (without prefix)
+
+        Returns:
+            The decoded value, or None on a miss or when caching is unavailable
+        """
+        client = self.client
+        if client is None:
+            return None
+
+        try:
+            raw = await client.get(self._key(key))
+        except RedisError as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            return None
+
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set_json(self, key: str, value: Any, ttl_seconds: int, tags: Iterable[str] = ()) -> None:
+        """
+        Store a JSON value and record it under the given tags
+
+        Args:
+            key: Cache key (without prefix)
+            value: JSON-serialisable value
+            ttl_seconds: Expiry for the value (tag sets are kept at least as long)
+            tags: Tags used to invalidate this key later
+        """
+        client = self.client
+        if client is None:
+            return
+
+        full_key = self._key(key)
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(full_key, orjson.dumps(value), ex=ttl_seconds)
+                for tag in tags:
+                    tag_key = self._tag_key(tag)
+                    pipe.sadd(tag_key, full_key)
+                    # Outlives every member added so far: keys under one tag must
+                    # share one TTL, or a shorter write cuts the tag's lifetime
+                    pipe.expire(tag_key, ttl_seconds)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+
+    async def pop_json(self, key: str) -> Optional[Any]:
+        """
+        Read a cached JSON value and delete it atomically (single-use values)
+
+        Args:
+            key: Cache key (without prefix)
+
+        Returns:
+            The decoded value, or None on a miss or when caching is unavailable
+        """
+        client = self.client
+        if client is None:
+            return None
+
+        full_key = self._key(key)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.get(full_key)
+                pipe.delete(full_key)
+                raw, _ = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Cache pop failed for {key}: {e}")
+            return None
+
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set_many_json(self, items: Dict[str, Any], ttl_seconds: int) -> None:
+        """
+        Store several JSON values in one round-trip
+
+        Args:
+            items: Mapping of cache key (without prefix) to JSON-serialisable value
+            ttl_seconds: Expiry applied to every value
+        """
+        client = self.client
+        if client is None or not items:
+            return
+
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(self._key(key), orjson.dumps(value), ex=ttl_seconds)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Cache write failed for {len(items)} keys: {e}")
+
+    async def delete(self, *keys: str) -> None:
+        """
+        Remove cached values
+
+        Args:
+            keys: Cache keys (without prefix)
+        """
+        client = self.client
+        if client is None or not keys:
+            return
+
+        try:
+            await client.delete(*(self._key(key) for key in keys))
+        except RedisError as e:
+            logger.warning(f"Cache delete failed for {keys}: {e}")
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        """
+        Drop every key recorded under any of the given tags
+
+        Args:
+            tags: Tags passed to set_json
+        """
+        client = self.client
+        if client is None or not tags:
+            return
+
+        try:
+            tag_keys = [self._tag_key(tag) for tag in tags]
+            async with client.pipeline(transaction=False) as pipe:
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                members = await pipe.execute()
+
+            keys = set(tag_keys)
+            for tag_members in members:
+                keys.update(tag_members)
+            await client.delete(*keys)
+        except RedisError as e:
+            logger.warning(f"Cache invalidation failed for {tags}: {e}")
+
+
+# Global instance
+cache_service = CacheService()
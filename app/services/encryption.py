@@ -1,14 +1,42 @@
 """
 Encryption utilities for securely storing OAuth tokens
 """
-from cryptography.fernet import Fernet
-from app.config import settings
+from typing import List, Optional, Tuple
 import base64
+import os
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from app.config import settings
+
+# Marks AES-GCM ciphertexts; anything else is a legacy Fernet token
+AESGCM_PREFIX = "v2."
+_NONCE_SIZE = 12
+_TAG_SIZE = 16
+_HKDF_INFO = b"phr-oauth-token-aes-256-gcm"
+
+
+def _derive_aead(fernet_key: bytes) -> AESGCM:
+    """Derive an AES-256-GCM cipher from a Fernet key (kept as the configured secret)"""
+    key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_HKDF_INFO).derive(
+        base64.urlsafe_b64decode(fernet_key)
+    )
+    return AESGCM(key)
 
 
 class TokenEncryption:
     """
-    Handles encryption and decryption of OAuth tokens using Fernet (symmetric encryption)
+    Handles encryption and decryption of OAuth tokens using AES-256-GCM
+    
+    ENCRYPTION_KEY may hold several comma-separated keys to support rotation:
+    the first key encrypts, and every key is tried when decrypting. Each AES
+    key is derived from the configured Fernet key with HKDF, so existing
+    configuration keeps working; tokens written by the earlier Fernet scheme
+    or an older key still decrypt, and decrypt_and_upgrade() re-encrypts them
+    under the current key (OAuthTokenService does so on first read).
     """
     
     def __init__(self):
@@ -22,13 +50,34 @@ class TokenEncryption:
                 "Generate one using: python -c 'from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())'"
             )
         
-        # Ensure the key is properly formatted
+        # Ensure the keys are properly formatted; the ciphers are built once per process
         try:
-            key = settings.encryption_key.encode() if isinstance(settings.encryption_key, str) else settings.encryption_key
-            self.cipher = Fernet(key)
+            keys = [key.strip().encode() for key in settings.encryption_key.split(",") if key.strip()]
+            self.cipher = MultiFernet([Fernet(key) for key in keys])
+            self.aeads: List[AESGCM] = [_derive_aead(key) for key in keys]
         except Exception as e:
             raise ValueError(f"Invalid encryption key format: {str(e)}")
     
+    def _decrypt_bytes(self, encrypted_data: str) -> Tuple[bytes, bool]:
+        """Decrypt either format; also report whether the current key/format was used"""
+        if not encrypted_data.startswith(AESGCM_PREFIX):
+            return self.cipher.decrypt(encrypted_data.encode()), False
+        
+        try:
+            raw = base64.urlsafe_b64decode(encrypted_data[len(AESGCM_PREFIX):])
+        except ValueError:
+            raise InvalidToken
+        if len(raw) < _NONCE_SIZE + _TAG_SIZE:
+            raise InvalidToken
+        
+        nonce, ciphertext = raw[:_NONCE_SIZE], raw[_NONCE_SIZE:]
+        for index, aead in enumerate(self.aeads):
+            try:
+                return aead.decrypt(nonce, ciphertext, None), index == 0
+            except InvalidTag:
+                continue
+        raise InvalidToken
+    
     def encrypt(self, data: str) -> str:
         """
         Encrypt a string
@@ -37,30 +86,52 @@ class TokenEncryption:
             data: Plain text string to encrypt
             
         Returns:
-            Encrypted string (base64 encoded)
+            Encrypted string (prefixed, base64 encoded nonce + ciphertext)
         """
         if not data:
             return ""
         
-        encrypted_bytes = self.cipher.encrypt(data.encode())
-        return encrypted_bytes.decode()
+        nonce = os.urandom(_NONCE_SIZE)
+        ciphertext = self.aeads[0].encrypt(nonce, data.encode(), None)
+        return AESGCM_PREFIX + base64.urlsafe_b64encode(nonce + ciphertext).decode()
     
     def decrypt(self, encrypted_data: str) -> str:
         """
         Decrypt an encrypted string
         
         Args:
-            encrypted_data: Encrypted string (base64 encoded)
+            encrypted_data: Encrypted string (AES-GCM or legacy Fernet)
             
         Returns:
             Decrypted plain text string
+            
+        Raises:
+            InvalidToken: If no configured key can decrypt the data
         """
         if not encrypted_data:
             return ""
         
-        decrypted_bytes = self.cipher.decrypt(encrypted_data.encode())
-        return decrypted_bytes.decode()
-
+        return self._decrypt_bytes(encrypted_data)[0].decode()
+    
+    def decrypt_and_upgrade(self, encrypted_data: str) -> Tuple[str, Optional[str]]:
+        """
+        Decrypt a string and re-encrypt it if it is not under the current key
+        
+        Args:
+            encrypted_data: Encrypted string produced with any configured key
+            
+        Returns:
+            Tuple of (plain text, re-encrypted string or None if already current)
+        """
+        if not encrypted_data:
+            return "", None
+        
+        plaintext, current = self._decrypt_bytes(encrypted_data)
+        text = plaintext.decode()
+        return text, (None if current else self.encrypt(text))
 
 # Global instance
 token_encryption = TokenEncryption()
+
+# Bound method of the singleton, so hot callers skip the attribute lookups
+encrypt_token = token_encryption.encrypt
@@ -3,15 +3,44 @@ FHIR Observation mapper service
 Converts vendor health data to FHIR Observation resources
 """
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, tzinfo
+from functools import lru_cache
+import asyncio
 import logging
-import httpx
+import orjson
 import pytz
+from fastapi import HTTPException
 
-from app.config import settings
+from app.fhir.client import fhir_client
 
 logger = logging.getLogger(__name__)
 
+# Observations per Bundle POST; keeps request bodies bounded for large syncs
+FHIR_BUNDLE_SIZE = 200
+
+# "HH" prefixes of Fitbit intraday times ("HH:MM:SS") kept by the 2-hour sampling
+_EVEN_HOURS = frozenset(f"{hour:02d}" for hour in range(0, 24, 2))
+
+_FITBIT_NOTE_PREFIX = "Source: Fitbit. Additional data: "
+_BLOOD_PRESSURE_NOTE_PREFIX = "Source: Blood Pressure Device. Additional data: "
+
+
+def _note_json(additional_data: Dict[str, Any]) -> str:
+    """Render note metadata as JSON (deterministic and parseable, unlike str(dict))"""
+    return orjson.dumps(additional_data, default=str).decode()
+
+
+def _localized(datetime_str: str, tz: tzinfo) -> datetime:
+    """Parse an ISO timestamp, attaching the user's timezone if it has none"""
+    effective_dt = datetime.fromisoformat(datetime_str)
+    return tz.localize(effective_dt) if effective_dt.tzinfo is None else effective_dt
+
+
+@lru_cache(maxsize=512)
+def _timezone(name: str) -> tzinfo:
+    """Resolve a timezone name once per process (pytz re-validates the name on every call)"""
+    return pytz.timezone(name)
+
 
 class FHIRMapper:
     """
@@ -58,6 +87,27 @@ class FHIRMapper:
         }
     }
     
+    # Static Observation fragments, built once and shared by every resource.
+    # Resources are only serialized, never mutated, so sharing is safe.
+    VITAL_SIGNS_CATEGORY = [{
+        "coding": [{
+            "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+            "code": "vital-signs",
+            "display": "Vital Signs"
+        }]
+    }]
+    CODE_BLOCKS = {
+        observation_type: {
+            "coding": [{
+                "system": loinc["system"],
+                "code": loinc["code"],
+                "display": loinc["display"]
+            }],
+            "text": loinc["display"]
+        }
+        for observation_type, loinc in LOINC_CODES.items()
+    }
+    
     def create_observation(
         self,
         patient_id: str,
@@ -67,7 +117,8 @@ class FHIRMapper:
         effective_datetime: datetime,
         additional_data: Optional[Dict[str, Any]] = None,
         user_timezone: str = "UTC",
-        identifier_override: Optional[str] = None
+        identifier_override: Optional[str] = None,
+        issued: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create a FHIR Observation resource
@@ -81,18 +132,18 @@ class FHIRMapper:
             additional_data: Additional metadata
             user_timezone: User's timezone (default: UTC)
             identifier_override: Custom identifier value to allow day-level upserts
+            issued: Pre-formatted issued timestamp, so batch callers format it once
             
         Returns:
             FHIR Observation resource as dict
         """
-        if observation_type not in self.LOINC_CODES:
+        code_block = self.CODE_BLOCKS.get(observation_type)
+        if code_block is None:
             raise ValueError(f"Unsupported observation type: {observation_type}")
         
-        loinc = self.LOINC_CODES[observation_type]
-        
         # Convert to user's timezone for identifier
         try:
-            tz = pytz.timezone(user_timezone)
+            tz = _timezone(user_timezone)
             if effective_datetime.tzinfo is None:
                 effective_datetime = pytz.UTC.localize(effective_datetime)
             effective_datetime_local = effective_datetime.astimezone(tz)
@@ -117,26 +168,13 @@ class FHIRMapper:
                 "value": identifier_value
             }],
             "status": "final",
-            "category": [{
-                "coding": [{
-                    "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                    "code": "vital-signs",
-                    "display": "Vital Signs"
-                }]
-            }],
-            "code": {
-                "coding": [{
-                    "system": loinc["system"],
-                    "code": loinc["code"],
-                    "display": loinc["display"]
-                }],
-                "text": loinc["display"]
-            },
+            "category": self.VITAL_SIGNS_CATEGORY,
+            "code": code_block,
             "subject": {
                 "reference": f"Patient/{patient_id}"
             },
             "effectiveDateTime": effective_datetime.isoformat(),
-            "issued": datetime.now(pytz.timezone(user_timezone)).isoformat(),
+            "issued": issued or datetime.now(_timezone(user_timezone)).isoformat(),
             "valueQuantity": {
                 "value": value,
                 "unit": unit,
@@ -148,7 +186,7 @@ class FHIRMapper:
         # Add additional metadata if provided
         if additional_data:
             observation["note"] = [{
-                "text": f"Source: Fitbit. Additional data: {str(additional_data)}"
+                "text": _FITBIT_NOTE_PREFIX + _note_json(additional_data)
             }]
         
         return observation
@@ -176,6 +214,10 @@ class FHIRMapper:
         observations = []
         
         try:
+            # One timestamp for the whole batch instead of one per observation
+            now = datetime.now(_timezone(user_timezone))
+            issued = now.isoformat()
+            
             # Check for intraday data first
             intraday_dataset = fitbit_data.get("activities-heart-intraday", {}).get("dataset", [])
             
@@ -191,11 +233,9 @@ class FHIRMapper:
                         value = datapoint.get("value")
                         
                         if time_str and value:
-                            # Parse hour from time string
-                            hour = int(time_str.split(":")[0])
-                            
-                            # Only keep data points at 2-hour intervals (0, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22)
-                            if hour % 2 != 0:
+                            # Only keep data points at 2-hour intervals (0, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22);
+                            # a set lookup on the "HH" prefix avoids a split and int() per sample
+                            if time_str[:2] not in _EVEN_HOURS:
                                 continue
                             
                             # Combine date and time to get full timestamp
@@ -213,7 +253,8 @@ class FHIRMapper:
                                 unit="beats/min",
                                 effective_datetime=effective_dt,
                                 additional_data={"type": "intraday"},
-                                user_timezone=user_timezone
+                                user_timezone=user_timezone,
+                                issued=issued
                             )
                             observations.append(obs)
             else:
@@ -222,30 +263,46 @@ class FHIRMapper:
                 if not activities_heart:
                     return observations
                 
-                for day_data in activities_heart:
-                    date_str = day_data.get("dateTime")
-                    value_data = day_data.get("value", {})
-                    
-                    # Resting heart rate
-                    resting_hr = value_data.get("restingHeartRate")
-                    if resting_hr and date_str:
-                        effective_dt = datetime.now(pytz.timezone(user_timezone))
-                        obs = self.create_observation(
-                            patient_id=patient_id,
-                            observation_type="heart_rate",
-                            value=float(resting_hr),
-                            unit="beats/min",
-                            effective_datetime=effective_dt,
-                            additional_data={"type": "resting"},
-                            user_timezone=user_timezone
-                        )
-                        observations.append(obs)
+                # Resting heart rate, one per day that reports it; a malformed
+                # day is skipped rather than discarding the others
+                observations = [
+                    obs
+                    for day_data in activities_heart
+                    if (obs := self._map_resting_heart_rate(patient_id, day_data, now, issued, user_timezone)) is not None
+                ]
         
         except Exception as e:
             logger.error(f"Error mapping Fitbit heart rate data: {str(e)}")
         
         return observations
     
+    def _map_resting_heart_rate(
+        self,
+        patient_id: str,
+        day_data: Dict[str, Any],
+        now: datetime,
+        issued: str,
+        user_timezone: str
+    ) -> Optional[Dict[str, Any]]:
+        """Map one day's resting heart rate, or None if it is missing or malformed"""
+        try:
+            if not (day_data.get("dateTime") and day_data.get("value", {}).get("restingHeartRate")):
+                return None
+            
+            return self.create_observation(
+                patient_id=patient_id,
+                observation_type="heart_rate",
+                value=float(day_data["value"]["restingHeartRate"]),
+                unit="beats/min",
+                effective_datetime=now,
+                additional_data={"type": "resting"},
+                user_timezone=user_timezone,
+                issued=issued
+            )
+        except Exception as e:
+            logger.warning(f"Skipping malformed Fitbit resting heart rate: {str(e)}")
+            return None
+    
     def map_fitbit_spo2(
         self,
         patient_id: str,
@@ -275,7 +332,7 @@ class FHIRMapper:
             
             if avg_spo2 and date_str:
                 # Use user's timezone for the timestamp
-                tz = pytz.timezone(user_timezone)
+                tz = _timezone(user_timezone)
                 effective_dt = datetime.now(tz)
                 obs = self.create_observation(
                     patient_id=patient_id,
@@ -319,43 +376,57 @@ class FHIRMapper:
         
         try:
             weight_logs = fitbit_data.get("weight", [])
-            tz = pytz.timezone(user_timezone)
+            tz = _timezone(user_timezone)
+            # One timestamp for the whole batch instead of one per observation
+            now = datetime.now(tz)
+            issued = now.isoformat()
             
-            for log in weight_logs:
-                weight = log.get("weight")
-                date_str = log.get("date")
-                time_str = log.get("time")
-                
-                if weight and date_str:
-                    # Use actual timestamp if available, otherwise use current time in user's timezone
-                    if time_str:
-                        datetime_str = f"{date_str}T{time_str}"
-                        effective_dt = datetime.fromisoformat(datetime_str)
-                        # Make it aware of user's timezone
-                        if effective_dt.tzinfo is None:
-                            effective_dt = tz.localize(effective_dt)
-                    else:
-                        effective_dt = datetime.now(tz)
-                    
-                    obs = self.create_observation(
-                        patient_id=patient_id,
-                        observation_type="body_weight",
-                        value=float(weight),
-                        unit="kg",
-                        effective_datetime=effective_dt,
-                        additional_data={
-                            "bmi": log.get("bmi"),
-                            "source": log.get("source")
-                        },
-                        user_timezone=user_timezone
-                    )
-                    observations.append(obs)
+            # A malformed log is skipped rather than discarding the others
+            observations = [
+                obs
+                for log in weight_logs
+                if (obs := self._map_weight_log(patient_id, log, tz, now, issued, user_timezone)) is not None
+            ]
         
         except Exception as e:
             logger.error(f"Error mapping Fitbit weight data: {str(e)}")
         
         return observations
     
+    def _map_weight_log(
+        self,
+        patient_id: str,
+        log: Dict[str, Any],
+        tz: tzinfo,
+        now: datetime,
+        issued: str,
+        user_timezone: str
+    ) -> Optional[Dict[str, Any]]:
+        """Map one Fitbit weight log, or None if it is incomplete or malformed"""
+        try:
+            if not (log.get("weight") and log.get("date")):
+                return None
+            
+            return self.create_observation(
+                patient_id=patient_id,
+                observation_type="body_weight",
+                value=float(log["weight"]),
+                unit="kg",
+                # Use actual timestamp if available, otherwise use current time in user's timezone
+                effective_datetime=(
+                    _localized(f"{log['date']}T{log['time']}", tz) if log.get("time") else now
+                ),
+                additional_data={
+                    "bmi": log.get("bmi"),
+                    "source": log.get("source")
+                },
+                user_timezone=user_timezone,
+                issued=issued
+            )
+        except Exception as e:
+            logger.warning(f"Skipping malformed Fitbit weight log: {str(e)}")
+            return None
+    
     def map_fitbit_calories_timeseries(
         self,
         patient_id: str,
@@ -379,6 +450,10 @@ class FHIRMapper:
         observations = []
         
         try:
+            # One timestamp for the whole batch instead of one per observation
+            now = datetime.now(_timezone(user_timezone))
+            issued = now.isoformat()
+            
             # Check for intraday data first
             intraday_dataset = fitbit_data.get("activities-calories-intraday", {}).get("dataset", [])
             
@@ -406,7 +481,8 @@ class FHIRMapper:
                                 unit="kcal",
                                 effective_datetime=effective_dt,
                                 user_timezone=user_timezone,
-                                identifier_override=identifier_override
+                                identifier_override=identifier_override,
+                                issued=issued
                             )
                            
                             observations.append(obs)
@@ -421,16 +497,16 @@ class FHIRMapper:
                             value = float(value_str)
                         except (TypeError, ValueError):
                             continue
-                        effective_dt = datetime.now(pytz.timezone(user_timezone))
                         identifier_override = f"fitbit-{patient_id}-calories-{date_str}-daily"
                         obs = self.create_observation(
                             patient_id=patient_id,
                             observation_type="calories",
                             value=value,
                             unit="kcal",
-                            effective_datetime=effective_dt,
+                            effective_datetime=now,
                             user_timezone=user_timezone,
-                            identifier_override=identifier_override
+                            identifier_override=identifier_override,
+                            issued=issued
                         ) 
                         observations.append(obs)
         except Exception as e:
@@ -462,7 +538,7 @@ class FHIRMapper:
         try:
             # Use daily summary for total steps
             summary = fitbit_data.get("summary", {})
-            effective_dt = datetime.now(pytz.timezone(user_timezone))
+            effective_dt = datetime.now(_timezone(user_timezone))
             
             # Steps - one observation per day
             steps = summary.get("steps")
@@ -506,13 +582,7 @@ class FHIRMapper:
         observation = {
             "resourceType": "Observation",
             "status": "final",
-            "category": [{
-                "coding": [{
-                    "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                    "code": "vital-signs",
-                    "display": "Vital Signs"
-                }]
-            }],
+            "category": self.VITAL_SIGNS_CATEGORY,
             "code": {
                 "coding": [{
                     "system": "http://loinc.org",
@@ -562,7 +632,7 @@ class FHIRMapper:
         # Add additional metadata if provided
         if additional_data:
             observation["note"] = [{
-                "text": f"Source: Blood Pressure Device. Additional data: {str(additional_data)}"
+                "text": _BLOOD_PRESSURE_NOTE_PREFIX + _note_json(additional_data)
             }]
         
         return observation
@@ -572,8 +642,8 @@ class FHIRMapper:
         observations: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """
-        Post FHIR Observations to HAPI FHIR server using conditional create/update
-        to prevent duplicates based on identifier
+        Post FHIR Observations to HAPI FHIR server in batch Bundles, using
+        conditional create to prevent duplicates based on identifier
         
         Args:
             observations: List of FHIR Observation resources
@@ -591,45 +661,52 @@ class FHIRMapper:
             "errors": [],
         }
         
-        async with httpx.AsyncClient() as client:
-            for obs in observations:
-                try:
-                    headers = {"Content-Type": "application/fhir+json"}
-
-                    # Prefer HAPI conditional create to avoid per-resource search roundtrips.
-                    identifier = obs.get("identifier", [])
-                    if identifier and len(identifier) > 0:
-                        identifier_value = identifier[0].get("value")
-                        identifier_system = identifier[0].get("system")
-                        if identifier_value and identifier_system:
-                            headers["If-None-Exist"] = f"identifier={identifier_system}|{identifier_value}"
-
-                    response = await client.post(
-                        f"{settings.fhir_base_url}/Observation",
-                        json=obs,
-                        headers=headers,
-                        timeout=30.0,
-                    )
-
-                    # HAPI returns 201 when created; for conditional create, it can return 200 when it matched an existing resource.
-                    if response.status_code == 201:
-                        results["created"] += 1
-                    elif response.status_code == 200:
-                        results["skipped"] += 1
-                    else:
-                        results["failed"] += 1
-                        error_msg = f"Failed to post observation: {response.status_code} - {response.text}"
-                        results["errors"].append(error_msg)
-                        logger.error(error_msg)
+        # A "batch" bundle reports a status per entry, so one bad Observation
+        # does not fail the rest of its chunk the way a transaction would.
+        # Chunks go out concurrently; the client's semaphore bounds how many
+        # requests are in flight at once.
+        chunks = [
+            observations[i:i + FHIR_BUNDLE_SIZE]
+            for i in range(0, len(observations), FHIR_BUNDLE_SIZE)
+        ]
+        responses = await asyncio.gather(
+            # Conditional create (If-None-Exist on identifier) avoids duplicates
+            *(fhir_client.post_bundle(chunk, bundle_type="batch", conditional=True) for chunk in chunks),
+            return_exceptions=True
+        )
+        
+        for chunk, response_bundle in zip(chunks, responses):
+            if isinstance(response_bundle, HTTPException):
+                results["failed"] += len(chunk)
+                error_msg = f"Failed to post observation bundle: {response_bundle.status_code} - {response_bundle.detail}"
+                results["errors"].append(error_msg)
+                logger.error(error_msg)
+                continue
+            if isinstance(response_bundle, Exception):
+                # An unexpected error fails only its own chunk, not the whole sync
+                results["failed"] += len(chunk)
+                error_msg = f"Failed to post observation bundle: {type(response_bundle).__name__} - {response_bundle}"
+                results["errors"].append(error_msg)
+                logger.error(error_msg, exc_info=response_bundle)
+                continue
+            if isinstance(response_bundle, BaseException):
+                # Cancellation still propagates
+                raise response_bundle
+            
+            response_entries = response_bundle.get("entry", [])
+            for index in range(len(chunk)):
+                entry = response_entries[index] if index < len(response_entries) else {}
+                entry_response = entry.get("response", {})
+                entry_status = str(entry_response.get("status", ""))
                 
-                except httpx.HTTPError as e:
-                    results["failed"] += 1
-                    error_msg = f"HTTP error posting observation: {str(e)}"
-                    results["errors"].append(error_msg)
-                    logger.error(error_msg)
-                except Exception as e:
+                # HAPI returns 201 when created; for conditional create, it returns 200 when it matched an existing resource.
+                if entry_status.startswith("201"):
+                    results["created"] += 1
+                elif entry_status.startswith("200"):
+                    results["skipped"] += 1
+                else:
                     results["failed"] += 1
-                    error_msg = f"Error posting observation: {str(e)}"
+                    error_msg = f"Failed to post observation: {entry_status or 'no response'} - {entry_response.get('outcome')}"
                     results["errors"].append(error_msg)
                     logger.error(error_msg)
         
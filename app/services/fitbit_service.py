@@ -4,6 +4,7 @@ Handles data fetching, token refresh, and API interactions
 """
 import httpx
 import base64
+from functools import cached_property
 from datetime import datetime, timedelta, date
 from typing import Optional, Dict, List, Any
 from sqlalchemy.orm import Session
@@ -30,6 +31,42 @@ class FitbitService:
     def __init__(self):
         self.api_url = settings.fitbit_api_url
         self.token_url = settings.fitbit_token_url
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @cached_property
+    def token_headers(self) -> Dict[str, str]:
+        """Headers for OAuth token requests (Basic auth with the app's client credentials)"""
+        credentials = f"{settings.fitbit_client_id}:{settings.fitbit_client_secret}"
+        return {
+            "Authorization": f"Basic {base64.b64encode(credentials.encode()).decode()}",
+            "Content-Type": "application/x-www-form-urlencoded"
+        }
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client shared by all Fitbit API and token requests"""
+        return httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=200),
+            http2=True,
+        )
+    
+    async def startup(self) -> None:
+        """Open the shared HTTP client (called from the app lifespan)"""
+        if self._client is None:
+            self._client = self._build_client()
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client (called from the app lifespan)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, opened lazily when used outside the app lifespan"""
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
     
     async def _refresh_access_token(
         self,
@@ -52,33 +89,22 @@ class FitbitService:
             FitbitAPIError: If token refresh fails
         """
         try:
-            # Prepare Basic Auth header
-            credentials = f"{settings.fitbit_client_id}:{settings.fitbit_client_secret}"
-            encoded_credentials = base64.b64encode(credentials.encode()).decode()
-            
-            headers = {
-                "Authorization": f"Basic {encoded_credentials}",
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
-            
             data = {
                 "grant_type": "refresh_token",
                 "refresh_token": refresh_token
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.token_url,
-                    headers=headers,
-                    data=data,
-                    timeout=30.0
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Token refresh failed: {response.text}")
-                    raise FitbitAPIError(f"Failed to refresh token: {response.text}")
-                
-                token_data = response.json()
+            response = await self.client.post(
+                self.token_url,
+                headers=self.token_headers,
+                data=data
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Token refresh failed: {response.text}")
+                raise FitbitAPIError(f"Failed to refresh token: {response.text}")
+            
+            token_data = response.json()
             
             # Store new tokens
             oauth_token_service.store_tokens(
@@ -171,33 +197,23 @@ class FitbitService:
         url = f"{self.api_url}{endpoint}"
         
         try:
-            async with httpx.AsyncClient() as client:
-                if method == "GET":
-                    response = await client.get(
-                        url,
-                        headers=headers,
-                        params=params,
-                        timeout=30.0
-                    )
-                else:
-                    response = await client.request(
-                        method,
-                        url,
-                        headers=headers,
-                        params=params,
-                        timeout=30.0
-                    )
-                
-                # Handle rate limiting
-                if response.status_code == 429:
-                    logger.warning(f"Fitbit API rate limit reached for integration {vendor_integration_id}")
-                    raise FitbitAPIError("Rate limit exceeded. Please try again later.")
-                
-                if response.status_code != 200:
-                    logger.error(f"Fitbit API error: {response.status_code} - {response.text}")
-                    raise FitbitAPIError(f"API request failed: {response.text}")
-                
-                return response.json()
+            response = await self.client.request(
+                method,
+                url,
+                headers=headers,
+                params=params
+            )
+            
+            # Handle rate limiting
+            if response.status_code == 429:
+                logger.warning(f"Fitbit API rate limit reached for integration {vendor_integration_id}")
+                raise FitbitAPIError("Rate limit exceeded. Please try again later.")
+            
+            if response.status_code != 200:
+                logger.error(f"Fitbit API error: {response.status_code} - {response.text}")
+                raise FitbitAPIError(f"API request failed: {response.text}")
+            
+            return response.json()
         
         except httpx.HTTPError as e:
             logger.error(f"HTTP error during API request: {str(e)}")
@@ -66,25 +66,27 @@ class FitbitIngestionService:
             normalized = [dto for dto in normalized if dto.effective_datetime > after_datetime]
 
         # Convert DTOs to FHIR Observations with a stable idempotency key.
-        observations = []
-        for dto in normalized:
-            identifier_value = self._dedupe_identifier(
-                patient_id=user.fhir_patient_id,
-                observation_type=dto.observation_type,
-                effective_datetime=dto.effective_datetime,
-                vendor_source_id=dto.vendor_source_id,
-            )
-            obs = fhir_mapper.create_observation(
+        user_timezone = user.timezone or "UTC"
+        issued = datetime.now(pytz.timezone(user_timezone)).isoformat()
+        observations = [
+            fhir_mapper.create_observation(
                 patient_id=user.fhir_patient_id,
                 observation_type=dto.observation_type,
                 value=float(dto.value),
                 unit=dto.unit,
                 effective_datetime=dto.effective_datetime,
                 additional_data=(dto.additional_data or {}),
-                user_timezone=user.timezone or "UTC",
-                identifier_override=identifier_value,
+                user_timezone=user_timezone,
+                identifier_override=self._dedupe_identifier(
+                    patient_id=user.fhir_patient_id,
+                    observation_type=dto.observation_type,
+                    effective_datetime=dto.effective_datetime,
+                    vendor_source_id=dto.vendor_source_id,
+                ),
+                issued=issued,
             )
-            observations.append(obs)
+            for dto in normalized
+        ]
 
         post_result = await fhir_mapper.post_observations_to_fhir(observations)
         return {
@@ -0,0 +1,82 @@
+"""
+Short-lived store for OAuth state tokens
+
+Maps a state token issued by an authorize endpoint to the user and
+integration it was issued for, until the provider redirects back to the
+callback. Redis is used when configured so the callback can land on any
+worker or replica; otherwise states live in process memory.
+"""
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+from app.config import settings
+from app.services.cache_service import cache_service
+
+# Providers redirect back within minutes; matches the signed state's expiry
+OAUTH_STATE_TTL_SECONDS = 300
+
+
+class OAuthStateStore(ABC):
+    """Interface for storing single-use OAuth state payloads"""
+
+    @abstractmethod
+    async def put(self, state: str, payload: Dict[str, Any], ttl_seconds: int = OAUTH_STATE_TTL_SECONDS) -> None:
+        """
+        Remember a state token
+
+        Args:
+            state: State token sent to the OAuth provider
+            payload: JSON-serialisable data to return on the callback
+            ttl_seconds: How long the state stays valid
+        """
+
+    @abstractmethod
+    async def pop(self, state: str) -> Optional[Dict[str, Any]]:
+        """
+        Consume a state token
+
+        Args:
+            state: State token received on the callback
+
+        Returns:
+            The stored payload, or None if unknown or expired
+        """
+
+
+class RedisOAuthStateStore(OAuthStateStore):
+    """State store shared by all workers through Redis"""
+
+    def _key(self, state: str) -> str:
+        # State tokens are signed JWTs; a digest keeps keys short
+        return f"oauth-state:{hashlib.blake2b(state.encode(), digest_size=16).hexdigest()}"
+
+    async def put(self, state: str, payload: Dict[str, Any], ttl_seconds: int = OAUTH_STATE_TTL_SECONDS) -> None:
+        await cache_service.set_json(self._key(state), payload, ttl_seconds)
+
+    async def pop(self, state: str) -> Optional[Dict[str, Any]]:
+        return await cache_service.pop_json(self._key(state))
+
+
+class InMemoryOAuthStateStore(OAuthStateStore):
+    """Per-process state store for development; expired states are dropped automatically"""
+
+    def __init__(self, maxsize: int = 10000):
+        self._states: TTLCache = TTLCache(maxsize=maxsize, ttl=OAUTH_STATE_TTL_SECONDS)
+        self._lock = threading.Lock()
+
+    async def put(self, state: str, payload: Dict[str, Any], ttl_seconds: int = OAUTH_STATE_TTL_SECONDS) -> None:
+        # TTLCache has one TTL for all entries; callers use the default
+        with self._lock:
+            self._states[state] = payload
+
+    async def pop(self, state: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._states.pop(state, None)
+
+
+# Global instance
+oauth_state_store: OAuthStateStore = RedisOAuthStateStore() if settings.redis_url else InMemoryOAuthStateStore()
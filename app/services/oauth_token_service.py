@@ -7,7 +7,7 @@ from typing import Optional, Tuple
 
 from app.models.vendor_integration import OAuthToken
 from app.models.vendor_integration import VendorIntegration
-from app.services.encryption import token_encryption
+from app.services.encryption import encrypt_token, token_encryption
 
 
 class OAuthTokenService:
@@ -44,8 +44,8 @@ class OAuthTokenService:
         expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
         
         # Encrypt tokens
-        encrypted_access = token_encryption.encrypt(access_token)
-        encrypted_refresh = token_encryption.encrypt(refresh_token) if refresh_token else None
+        encrypted_access = encrypt_token(access_token)
+        encrypted_refresh = encrypt_token(refresh_token) if refresh_token else None
         
         # Check if token already exists for this integration
         existing_token = db.query(OAuthToken).filter(
@@ -113,8 +113,21 @@ class OAuthTokenService:
             return None
         
         # Decrypt tokens
-        access_token = token_encryption.decrypt(oauth_token.encrypted_access_token)
-        refresh_token = token_encryption.decrypt(oauth_token.encrypted_refresh_token) if oauth_token.encrypted_refresh_token else None
+        access_token, upgraded_access = token_encryption.decrypt_and_upgrade(oauth_token.encrypted_access_token)
+        refresh_token, upgraded_refresh = (
+            token_encryption.decrypt_and_upgrade(oauth_token.encrypted_refresh_token)
+            if oauth_token.encrypted_refresh_token else (None, None)
+        )
+        
+        # Tokens from the legacy Fernet scheme or a retired key are re-encrypted
+        # once. Only flushed: a read must not commit the caller's session, so the
+        # upgrade is saved with the caller's next commit (e.g. the sync job's).
+        if upgraded_access or upgraded_refresh:
+            if upgraded_access:
+                oauth_token.encrypted_access_token = upgraded_access
+            if upgraded_refresh:
+                oauth_token.encrypted_refresh_token = upgraded_refresh
+            db.flush()
         
         return (access_token, refresh_token)
     
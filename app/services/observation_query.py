@@ -0,0 +1,67 @@
+"""
+Helpers shared by the endpoints that read a patient's Observations
+
+Builds FHIR search parameters for the vendor-agnostic observation types and
+maps search results to HealthObservation without re-running validation.
+"""
+import logging
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from app.schemas.vendor import HealthObservation
+
+logger = logging.getLogger(__name__)
+
+# Only the elements to_health_observation reads
+OBSERVATION_ELEMENTS = "id,code,valueQuantity,effectiveDateTime"
+
+# Map common observation types to LOINC codes
+TYPE_TO_LOINC: Mapping[str, str] = MappingProxyType({
+    "heart_rate": "8867-4",
+    "spo2": "59408-5",
+    "body_weight": "29463-7",
+    "steps": "41950-7",
+    "calories": "41981-2",
+    "distance": "41953-1"
+})
+
+# Ready-made "code" search values, formatted once at import
+LOINC_PARAM: Mapping[str, str] = MappingProxyType({
+    observation_type: f"http://loinc.org|{loinc}" for observation_type, loinc in TYPE_TO_LOINC.items()
+})
+
+
+def to_health_observation(resource: Dict[str, Any], patient_id: str) -> Optional[HealthObservation]:
+    """
+    Map a FHIR Observation to a HealthObservation without re-running validation
+    
+    Output from our own FHIR server is trusted, so the model is built with
+    model_construct; only the timestamp needs converting by hand.
+    
+    Args:
+        resource: FHIR resource taken from a search Bundle entry
+        patient_id: FHIR Patient ID the search was scoped to
+        
+    Returns:
+        HealthObservation, or None if the resource is not a usable Observation
+    """
+    if resource.get("resourceType") != "Observation":
+        return None
+    
+    try:
+        code_coding = resource.get("code", {}).get("coding", [{}])[0]
+        value_quantity = resource.get("valueQuantity", {})
+        return HealthObservation.model_construct(
+            id=resource.get("id", ""),
+            code=code_coding.get("code", ""),
+            code_system=code_coding.get("system", ""),
+            display=code_coding.get("display", ""),
+            value=float(value_quantity.get("value", 0)),
+            unit=value_quantity.get("unit", ""),
+            effective_datetime=datetime.fromisoformat(resource["effectiveDateTime"]),
+            patient_id=patient_id
+        )
+    except Exception as e:
+        logger.warning(f"Failed to parse observation: {str(e)}")
+        return None
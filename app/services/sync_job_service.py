@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import uuid4
 
 import pytz
+from sqlalchemy import Row, and_, case, func, insert, or_, select, update
 from sqlalchemy.orm import Session
 
 from app.models.sync_job import SyncJob
@@ -43,6 +45,131 @@ class SyncJobService:
         db.refresh(job)
         return job
 
+    def _active_jobs(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        vendors: Sequence[str],
+        stale_after_seconds: int,
+    ) -> Dict[str, Row]:
+        """Map each vendor to its queued job, or a job running for less than stale_after_seconds.
+
+        The integration rows are locked first (FOR UPDATE on PostgreSQL), so
+        concurrent enqueues for the same user+vendor (a double-tap, a retrying
+        client) wait for each other instead of both finding no active job.
+        A running job older than the cutoff is presumed dead (a crashed
+        worker) and no longer blocks new ones.
+        """
+        db.execute(
+            select(VendorIntegration.id)
+            .where(VendorIntegration.user_id == user_id, VendorIntegration.vendor.in_(vendors))
+            .with_for_update()
+        )
+        started_after = datetime.now(pytz.UTC) - timedelta(seconds=stale_after_seconds)
+        rows = db.execute(
+            select(SyncJob.vendor, SyncJob.id, SyncJob.status)
+            .where(
+                SyncJob.user_id == user_id,
+                SyncJob.vendor.in_(vendors),
+                or_(
+                    SyncJob.status == "queued",
+                    and_(SyncJob.status == "running", SyncJob.started_at >= started_after),
+                ),
+            )
+            .order_by(SyncJob.created_at.asc())
+        ).all()
+        # Newest active job per vendor wins
+        return {row.vendor: row for row in rows}
+
+    def enqueue_debounced(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        vendor: str,
+        stale_after_seconds: int,
+        trigger: str = "manual",
+    ) -> Tuple[str, str, bool]:
+        """Enqueue a job unless the vendor already has a queued or running one.
+
+        Returns (sync_job_id, sync_status, created); when a job is already
+        active, its id and status are returned instead of a new job.
+        """
+        vendor_key = vendor.lower().strip()
+        active = self._active_jobs(
+            db, user_id=user_id, vendors=[vendor_key], stale_after_seconds=stale_after_seconds
+        ).get(vendor_key)
+        if active is not None:
+            db.rollback()
+            return active.id, active.status, False
+
+        job_id = self._insert_jobs(db, user_id=user_id, vendors=[vendor_key], trigger=trigger)[vendor_key]
+        db.commit()
+        return job_id, "queued", True
+
+    def enqueue_many(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        vendors: Sequence[str],
+        stale_after_seconds: int,
+        trigger: str = "manual",
+    ) -> List[Tuple[str, str]]:
+        """Enqueue one job per vendor for a user in a single transaction.
+
+        Vendors that already have a queued or running job keep it, as in
+        enqueue_debounced. The new jobs go in as one multi-row INSERT and the
+        integrations are marked queued with one UPDATE, instead of a
+        round-trip and commit per vendor. Returns (vendor, job_id) pairs in
+        the given order.
+        """
+        vendor_keys = list(dict.fromkeys(vendor.lower().strip() for vendor in vendors))
+        if not vendor_keys:
+            return []
+
+        active = self._active_jobs(
+            db, user_id=user_id, vendors=vendor_keys, stale_after_seconds=stale_after_seconds
+        )
+        job_ids = {vendor: row.id for vendor, row in active.items()}
+        job_ids.update(
+            self._insert_jobs(
+                db, user_id=user_id, vendors=[vendor for vendor in vendor_keys if vendor not in active], trigger=trigger
+            )
+        )
+
+        db.commit()
+        return [(vendor, job_ids[vendor]) for vendor in vendor_keys]
+
+    def _insert_jobs(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        vendors: Sequence[str],
+        trigger: str,
+    ) -> Dict[str, str]:
+        """Insert a queued job per vendor and point each integration at it, without committing."""
+        job_ids = {vendor: str(uuid4()) for vendor in vendors}
+        if not job_ids:
+            return job_ids
+
+        db.execute(
+            insert(SyncJob),
+            [
+                {"id": job_id, "user_id": user_id, "vendor": vendor, "trigger": trigger, "status": "queued"}
+                for vendor, job_id in job_ids.items()
+            ],
+        )
+        db.execute(
+            update(VendorIntegration)
+            .where(VendorIntegration.user_id == user_id, VendorIntegration.vendor.in_(job_ids))
+            .values(sync_status="queued", sync_job_id=case(job_ids, value=VendorIntegration.vendor))
+            .execution_options(synchronize_session=False)
+        )
+        return job_ids
+
     def get_latest_job(
         self,
         db: Session,
@@ -58,6 +185,54 @@ class SyncJobService:
             .first()
         )
 
+    def get_integrations_with_latest_job(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        vendor: Optional[str] = None,
+    ) -> List[Row]:
+        """Load a user's integrations paired with each vendor's latest job.
+
+        One query: the newest job per vendor is picked with ROW_NUMBER() and
+        outer-joined, instead of a get_latest_job round-trip per integration.
+        Rows carry exactly the VendorSyncStatus fields, labelled by field name,
+        so no ORM entities are built.
+        """
+        ranked = (
+            select(
+                SyncJob.vendor,
+                SyncJob.status,
+                SyncJob.last_error,
+                SyncJob.started_at,
+                SyncJob.finished_at,
+                func.row_number()
+                .over(partition_by=SyncJob.vendor, order_by=SyncJob.created_at.desc())
+                .label("rn"),
+            )
+            .where(SyncJob.user_id == user_id)
+            .subquery()
+        )
+
+        stmt = (
+            select(
+                VendorIntegration.vendor,
+                VendorIntegration.vendor_user_id,
+                VendorIntegration.last_successful_sync_at,
+                VendorIntegration.sync_status,
+                VendorIntegration.sync_job_id,
+                ranked.c.status.label("last_job_status"),
+                ranked.c.last_error.label("last_job_error"),
+                ranked.c.started_at.label("last_job_started_at"),
+                ranked.c.finished_at.label("last_job_finished_at"),
+            )
+            .outerjoin(ranked, and_(ranked.c.vendor == VendorIntegration.vendor, ranked.c.rn == 1))
+            .where(VendorIntegration.user_id == user_id)
+        )
+        if vendor:
+            stmt = stmt.where(VendorIntegration.vendor == vendor.lower().strip())
+        return list(db.execute(stmt).all())
+
     def claim_next_queued_job(self, db: Session) -> Optional[SyncJob]:
         """Claim a queued job for execution.
 
@@ -113,10 +288,11 @@ class SyncJobService:
             VendorIntegration.vendor == job.vendor,
         ).first()
         if integration:
-            integration.sync_status = "success"
-            integration.sync_job_id = job.id
             integration.last_successful_sync_at = utc_now
             integration.last_sync_at = utc_now
+            # A newer job may have been queued since; leave its status visible
+            if integration.sync_job_id == job.id:
+                integration.sync_status = "success"
 
         db.commit()
 
@@ -133,9 +309,9 @@ class SyncJobService:
             VendorIntegration.user_id == job.user_id,
             VendorIntegration.vendor == job.vendor,
         ).first()
-        if integration:
+        # A newer job may have been queued since; leave its status visible
+        if integration and integration.sync_job_id == job.id:
             integration.sync_status = "failed"
-            integration.sync_job_id = job.id
 
         db.commit()
 
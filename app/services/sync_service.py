@@ -79,19 +79,21 @@ class SyncService:
                 date_str=date_str
             )
             
-            # Debug: Print raw Fitbit responses
-            logger.info(f"=== RAW FITBIT RESPONSE ===")
-            if fitbit_data.get("heart_rate"):
-                logger.info(f"Heart Rate Response: {fitbit_data['heart_rate']}")
-            if fitbit_data.get("spo2"):
-                logger.info(f"SpO2 Response: {fitbit_data['spo2']}")
-            if fitbit_data.get("body_weight"):
-                logger.info(f"Weight Response: {fitbit_data['body_weight']}")
-            if fitbit_data.get("activity_summary"):
-                logger.info(f"Activity Summary Response: {fitbit_data['activity_summary']}")
-            if fitbit_data.get("calories_timeseries"):
-                logger.info(f"Calories Timeseries Response: {fitbit_data['calories_timeseries']}")
-            logger.info(f"=== END RAW FITBIT RESPONSE ===")
+            # Debug: Print raw Fitbit responses (intraday payloads are large, so
+            # they are only formatted when DEBUG logging is on)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("=== RAW FITBIT RESPONSE ===")
+                if fitbit_data.get("heart_rate"):
+                    logger.debug("Heart Rate Response: %s", fitbit_data["heart_rate"])
+                if fitbit_data.get("spo2"):
+                    logger.debug("SpO2 Response: %s", fitbit_data["spo2"])
+                if fitbit_data.get("body_weight"):
+                    logger.debug("Weight Response: %s", fitbit_data["body_weight"])
+                if fitbit_data.get("activity_summary"):
+                    logger.debug("Activity Summary Response: %s", fitbit_data["activity_summary"])
+                if fitbit_data.get("calories_timeseries"):
+                    logger.debug("Calories Timeseries Response: %s", fitbit_data["calories_timeseries"])
+                logger.debug("=== END RAW FITBIT RESPONSE ===")
             
             # Map to FHIR Observations
             all_observations = []
@@ -108,7 +110,7 @@ class SyncService:
                     user_timezone=user_timezone
                 )
                 all_observations.extend(hr_obs)
-                logger.debug(f"Mapped {len(hr_obs)} heart rate observations")
+                logger.debug("Mapped %d heart rate observations", len(hr_obs))
             
             # SpO2
             if fitbit_data.get("spo2"):
@@ -119,7 +121,7 @@ class SyncService:
                     user_timezone=user_timezone
                 )
                 all_observations.extend(spo2_obs)
-                logger.debug(f"Mapped {len(spo2_obs)} SpO2 observations")
+                logger.debug("Mapped %d SpO2 observations", len(spo2_obs))
             
             # Weight
             if fitbit_data.get("body_weight"):
@@ -130,7 +132,7 @@ class SyncService:
                     user_timezone=user_timezone
                 )
                 all_observations.extend(weight_obs)
-                logger.debug(f"Mapped {len(weight_obs)} weight observations")
+                logger.debug("Mapped %d weight observations", len(weight_obs))
             
             # Calories timeseries
             if fitbit_data.get("calories_timeseries"):
@@ -141,7 +143,7 @@ class SyncService:
                     user_timezone=user_timezone
                 )
                 all_observations.extend(calories_obs)
-                logger.debug(f"Mapped {len(calories_obs)} calories observations")
+                logger.debug("Mapped %d calories observations", len(calories_obs))
             
             # Post to FHIR server
             if all_observations:
@@ -1,4 +1,7 @@
 from typing import List, Optional
+import threading
+from cachetools import TTLCache
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
@@ -7,6 +10,22 @@ from app.schemas.user import UserCreate, UserUpdate
 from app.auth.auth import get_password_hash, verify_password
 from app.fhir.client import fhir_client
 
+# email -> user id for token resolution; evicted when a user is deleted or
+# changes email, and otherwise trusted for at most 30 seconds
+_user_ids_by_email: TTLCache = TTLCache(maxsize=8192, ttl=30)
+_user_ids_lock = threading.Lock()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_user_id(mapper, connection, target: User) -> None:
+    # Matched by ID: the previous email is not always loaded on the instance
+    with _user_ids_lock:
+        stale = [email for email, user_id in _user_ids_by_email.items() if user_id == target.id]
+        for email in stale:
+            _user_ids_by_email.pop(email, None)
+
+
 class UserService:
     @staticmethod
     def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
@@ -18,6 +37,20 @@ class UserService:
         """Get user by email"""
         return db.query(User).filter(User.email == email).first()
     
+    @staticmethod
+    def get_user_id_by_email(db: Session, email: str) -> Optional[int]:
+        """Get a user's ID by email, served from a short-lived cache when possible"""
+        with _user_ids_lock:
+            user_id = _user_ids_by_email.get(email)
+        if user_id is not None:
+            return user_id
+        
+        user_id = db.query(User.id).filter(User.email == email).scalar()
+        if user_id is not None:
+            with _user_ids_lock:
+                _user_ids_by_email[email] = user_id
+        return user_id
+    
     @staticmethod
     def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
         """Get all users with pagination"""
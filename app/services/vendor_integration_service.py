@@ -3,8 +3,8 @@ Service for managing vendor integrations
 """
 import pytz
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Optional, List
+from sqlalchemy import Row, and_, delete, select, update
+from typing import List, Literal, Optional
 from datetime import datetime
 
 from app.models.vendor_integration import VendorIntegration, OAuthToken
@@ -109,6 +109,61 @@ class VendorIntegrationService:
         
         return query.all()
     
+    def get_user_integration_summaries(
+        self,
+        db: Session,
+        user_id: int,
+        active_only: bool = True
+    ) -> List[Row]:
+        """
+        Get the listing columns of a user's vendor integrations
+        
+        Selects only what the integrations listing returns instead of whole
+        VendorIntegration rows.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            active_only: Only return active integrations
+            
+        Returns:
+            Rows with id, vendor, is_active, last_sync_at and created_at
+        """
+        query = select(
+            VendorIntegration.id,
+            VendorIntegration.vendor,
+            VendorIntegration.is_active,
+            VendorIntegration.last_sync_at,
+            VendorIntegration.created_at
+        ).where(VendorIntegration.user_id == user_id)
+        
+        if active_only:
+            query = query.where(VendorIntegration.is_active == True)
+        
+        return db.execute(query).all()
+    
+    def get_active_vendors(self, db: Session, user_id: int) -> List[str]:
+        """
+        Get the vendor names of a user's active integrations
+        
+        Selects only the vendor column, so no ORM instances are built.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            
+        Returns:
+            List of vendor names
+        """
+        return list(
+            db.execute(
+                select(VendorIntegration.vendor).where(
+                    VendorIntegration.user_id == user_id,
+                    VendorIntegration.is_active == True
+                )
+            ).scalars()
+        )
+    
     def update_last_sync(
         self,
         db: Session,
@@ -159,41 +214,54 @@ class VendorIntegrationService:
         
         return False
     
-    def disconnect_integration(
+    def disconnect_atomic(
         self,
         db: Session,
         user_id: int,
         vendor: str
-    ) -> bool:
+    ) -> Literal["ok", "missing", "already_off"]:
         """
         Disconnect a vendor integration by deactivating it and removing OAuth tokens
         
+        The deactivation is a single conditional UPDATE ... RETURNING, so the
+        common case is one UPDATE plus one DELETE in one transaction; a
+        follow-up SELECT only runs to explain why nothing was updated.
+        
         Args:
             db: Database session
             user_id: User ID
             vendor: Vendor name
             
         Returns:
-            True if successful, False otherwise
+            "ok" if disconnected, "missing" if the user has no such
+            integration, "already_off" if it was already inactive
         """
-        from app.services.oauth_token_service import oauth_token_service
-        
-        # Get the integration
-        integration = self.get_integration(db, user_id, vendor)
-        
-        if not integration:
-            return False
+        jakarta_tz = pytz.timezone('UTC')
+        integration_id = db.execute(
+            update(VendorIntegration)
+            .where(
+                VendorIntegration.user_id == user_id,
+                VendorIntegration.vendor == vendor,
+                VendorIntegration.is_active == True
+            )
+            .values(is_active=False, updated_at=datetime.now(jakarta_tz))
+            .returning(VendorIntegration.id)
+        ).scalar_one_or_none()
         
-        # Delete OAuth tokens
-        oauth_token_service.delete_tokens(db, integration.id)
+        if integration_id is None:
+            exists = db.execute(
+                select(VendorIntegration.id).where(
+                    VendorIntegration.user_id == user_id,
+                    VendorIntegration.vendor == vendor
+                )
+            ).first()
+            db.rollback()
+            return "already_off" if exists else "missing"
         
-        # Deactivate the integration
-        jakarta_tz = pytz.timezone('UTC')
-        integration.is_active = False
-        integration.updated_at = datetime.now(jakarta_tz)
+        # Delete OAuth tokens in the same transaction
+        db.execute(delete(OAuthToken).where(OAuthToken.vendor_integration_id == integration_id))
         db.commit()
         
-        return True
-
+        return "ok"
 
 vendor_integration_service = VendorIntegrationService()
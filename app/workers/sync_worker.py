@@ -11,6 +11,7 @@ from app.database import SessionLocal
 from app.models.sync_job import SyncJob
 from app.models.user import User
 from app.models.vendor_integration import VendorIntegration
+from app.services.cache_service import cache_service
 from app.services.ingestion.registry import ingestion_registry
 from app.services.sync_job_service import sync_job_service
 
@@ -94,6 +95,12 @@ class SyncWorker:
                 after_dt = integration.last_sync_at
 
             result = await svc.ingest(db=db, user=user, integration=integration, after_datetime=after_dt)
+            # Ingestion may have written observations even if it reports errors;
+            # drop the patient's cached reads (/observations pages, FHIR reads)
+            if user.fhir_patient_id:
+                await cache_service.invalidate_tags(
+                    f"patient:{user.fhir_patient_id}", f"observations:{user.fhir_patient_id}"
+                )
             if result.get("success"):
                 sync_job_service.mark_success(db, job_id=job.id)
             else:
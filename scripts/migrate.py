@@ -0,0 +1,19 @@
+"""
+Apply database migrations
+
+Run once per deploy, before starting the API workers:
+
+    python scripts/migrate.py
+"""
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.migrations import run_migrations
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+    run_migrations()
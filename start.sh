@@ -20,7 +20,8 @@ pip install -r requirements.txt
 
 # Run database migrations
 echo "Running database migrations..."
-alembic upgrade head
+python scripts/migrate.py
+export MIGRATION_MODE=skip
 
 # Start the server
 echo "Starting FastAPI server..."
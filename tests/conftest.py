@@ -0,0 +1,6 @@
+import os
+
+from cryptography.fernet import Fernet
+
+# app.services.encryption builds its singleton at import, which needs a key
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
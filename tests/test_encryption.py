@@ -0,0 +1,92 @@
+import base64
+import os
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from app.config import settings
+from app.services.encryption import AESGCM_PREFIX, TokenEncryption
+
+
+@pytest.fixture
+def make_encryption(monkeypatch):
+    """Build a TokenEncryption for the given keys, the first one current"""
+    def make(*keys: bytes) -> TokenEncryption:
+        monkeypatch.setattr(settings, "encryption_key", ",".join(key.decode() for key in keys))
+        return TokenEncryption()
+    return make
+
+
+def test_round_trip(make_encryption):
+    encryption = make_encryption(Fernet.generate_key())
+
+    encrypted = encryption.encrypt("access-token")
+
+    assert encrypted.startswith(AESGCM_PREFIX)
+    assert encryption.decrypt(encrypted) == "access-token"
+    assert encryption.decrypt_and_upgrade(encrypted) == ("access-token", None)
+
+
+def test_empty_string_round_trip(make_encryption):
+    encryption = make_encryption(Fernet.generate_key())
+
+    assert encryption.encrypt("") == ""
+    assert encryption.decrypt("") == ""
+    assert encryption.decrypt_and_upgrade("") == ("", None)
+
+
+def test_legacy_fernet_token_is_upgraded(make_encryption):
+    key = Fernet.generate_key()
+    encryption = make_encryption(key)
+    legacy = Fernet(key).encrypt(b"access-token").decode()
+
+    assert encryption.decrypt(legacy) == "access-token"
+
+    text, upgraded = encryption.decrypt_and_upgrade(legacy)
+    assert text == "access-token"
+    assert upgraded.startswith(AESGCM_PREFIX)
+    assert encryption.decrypt_and_upgrade(upgraded) == ("access-token", None)
+
+
+def test_key_rotation(make_encryption):
+    old_key, new_key = Fernet.generate_key(), Fernet.generate_key()
+    encrypted = make_encryption(old_key).encrypt("access-token")
+
+    rotated = make_encryption(new_key, old_key)
+    assert rotated.decrypt(encrypted) == "access-token"
+
+    text, upgraded = rotated.decrypt_and_upgrade(encrypted)
+    assert text == "access-token"
+    # The upgraded token no longer needs the retired key
+    assert make_encryption(new_key).decrypt(upgraded) == "access-token"
+    with pytest.raises(InvalidToken):
+        make_encryption(old_key).decrypt(upgraded)
+
+
+def test_unknown_key_raises_invalid_token(make_encryption):
+    encrypted = make_encryption(Fernet.generate_key()).encrypt("access-token")
+    legacy = Fernet(Fernet.generate_key()).encrypt(b"access-token").decode()
+
+    encryption = make_encryption(Fernet.generate_key())
+    with pytest.raises(InvalidToken):
+        encryption.decrypt(encrypted)
+    with pytest.raises(InvalidToken):
+        encryption.decrypt(legacy)
+
+
+@pytest.mark.parametrize(
+    "encrypted",
+    [
+        AESGCM_PREFIX,
+        AESGCM_PREFIX + "not*base64!",
+        # Shorter than a nonce plus tag
+        AESGCM_PREFIX + base64.urlsafe_b64encode(os.urandom(20)).decode(),
+        # Right length, but no key authenticates it
+        AESGCM_PREFIX + base64.urlsafe_b64encode(os.urandom(48)).decode(),
+    ],
+)
+def test_malformed_v2_token_raises_invalid_token(make_encryption, encrypted):
+    encryption = make_encryption(Fernet.generate_key())
+
+    with pytest.raises(InvalidToken):
+        encryption.decrypt(encrypted)